@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
-Utility script to download and verify Deezer model.
+Utility script to download and verify the AI music detector model.
+
+Fetches the Hugging Face weights into the local cache and saves the state_dict
+of an int8 dynamically-quantized copy that MusicAIDetector prefers on CPU.
 
 Usage:
     python execution/download_deezer_model.py
@@ -13,52 +16,53 @@ from pathlib import Path
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.layers.analysis.features.deepfake import DeezerDetector
+from src.layers.analysis.features.deepfake import MusicAIDetector, quantized_model_path, quantize_model
 
 def main():
-    print("🔧 Deezer Model Download Utility")
+    print("🔧 AI Music Detector Download Utility")
     print("=" * 50)
     
-    detector = DeezerDetector()
+    detector = MusicAIDetector()
     
     # Check PyTorch
     if not detector.is_available():
         print("❌ PyTorch not installed!")
-        print("   Install: pip install torch")
+        print("   Install: pip install torch transformers")
+        return 1
+    
+    import torch
+    
+    # Download (first load populates the Hugging Face cache)
+    print(f"📥 Fetching: {detector.model_id}")
+    detector._load_model()
+    if detector.classifier is None:
+        print("❌ Model failed to load")
         return 1
+    print("✅ Model loaded successfully!")
     
-    # Get model path
-    model_path = detector._get_model_path()
-    print(f"📂 Model path: {model_path}")
+    # Get quantized model path
+    q_path = quantized_model_path(detector.model_id)
+    print(f"📂 Quantized model path: {q_path}")
     
     # Check if exists
-    if model_path.exists():
-        size_mb = model_path.stat().st_size / (1024 * 1024)
-        print(f"✅ Model already exists ({size_mb:.1f} MB)")
+    if q_path.exists():
+        size_mb = q_path.stat().st_size / (1024 * 1024)
+        print(f"✅ Quantized model already exists ({size_mb:.1f} MB)")
         return 0
     
-    # Download
-    print(f"📥 Downloading from: {detector.MODEL_URL}")
-    success = detector._download_model()
-    
-    if success:
-        print("✅ Download complete!")
-        
-        # Verify
-        try:
-            detector._load_model()
-            if detector.model is not None:
-                print("✅ Model loaded successfully!")
-                return 0
-            else:
-                print("❌ Model failed to load")
-                return 1
-        except Exception as e:
-            print(f"❌ Model verification failed: {e}")
-            return 1
-    else:
-        print("❌ Download failed")
+    # Quantize Linear layers to int8 (CPU inference only)
+    try:
+        model = detector.classifier.model.to("cpu").eval()
+        q_path.parent.mkdir(parents=True, exist_ok=True)
+        # Weights only: the detector loads them with torch.load(weights_only=True)
+        torch.save(quantize_model(model).state_dict(), q_path)
+    except Exception as e:
+        print(f"❌ Quantization failed: {e}")
         return 1
+    
+    size_mb = q_path.stat().st_size / (1024 * 1024)
+    print(f"✅ Saved int8 model ({size_mb:.1f} MB)")
+    return 0
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -6,9 +6,12 @@ thresholds, and model settings.
 """
 
 import os
+import functools
+import importlib
+import importlib.util
 from enum import Enum
 from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from pathlib import Path
 from src.utils.logger import logger
 
@@ -21,6 +24,11 @@ try:
 except ImportError:
     pass  # python-dotenv not installed, will use system env vars only
 
+# Environment snapshot taken once at import (after .env is loaded).
+# Set MUSICTRUTH_DISABLE_ENV_CACHE=1 to have Config() re-read os.environ instead.
+_ENV = os.environ.copy()
+_ENV_CACHE_DISABLED = _ENV.get('MUSICTRUTH_DISABLE_ENV_CACHE') == '1'
+
 # ============================================================================
 # Analysis Modes
 # ============================================================================
@@ -38,6 +46,20 @@ class AnalysisMode(Enum):
 # Feature Flags
 # ============================================================================
 
+# (flag attribute, module name, message logged when missing)
+_OPTIONAL_LIBRARIES = [
+    ('audioflux_available', 'audioflux', "AudioFlux not installed (optional)."),
+    ('essentia_available', 'essentia', "Essentia not installed (optional)."),
+    ('torch_available', 'torch', "PyTorch not installed. Deep learning features disabled."),
+    ('torchcrepe_available', 'torchcrepe', "torchcrepe not installed. GPU pitch tracking disabled."),
+    ('transformers_available', 'transformers', "Transformers not installed. LLM/Deepfake features disabled."),
+    ('music21_available', 'music21', "music21 not installed. MIDI analysis disabled."),
+    ('pretty_midi_available', 'pretty_midi', "pretty_midi not installed. MIDI analysis disabled."),
+    ('plotly_available', 'plotly', "Plotly not installed (optional)."),
+    ('seaborn_available', 'seaborn', "Seaborn not installed (optional)."),
+    ('demucs_available', 'demucs', "Demucs not installed. Source separation disabled."),
+]
+
 @dataclass
 class FeatureFlags:
     """Feature availability flags based on installed libraries."""
@@ -52,6 +74,7 @@ class FeatureFlags:
     
     # ML libraries
     torch_available: bool = False
+    torchcrepe_available: bool = False
     transformers_available: bool = False
     
     # MIDI libraries
@@ -70,60 +93,36 @@ class FeatureFlags:
         self._detect_libraries()
     
     def _detect_libraries(self):
-        """Detect which optional libraries are installed."""
-        try:
-            import audioflux
-            self.audioflux_available = True
-        except ImportError:
-            logger.debug("AudioFlux not installed (optional).")
-        
-        try:
-            import essentia
-            self.essentia_available = True
-        except ImportError:
-            logger.debug("Essentia not installed (optional).")
-        
-        try:
-            import torch
-            self.torch_available = True
-        except ImportError:
-            logger.debug("PyTorch not installed. Deep learning features disabled.")
-        
-        try:
-            import transformers
-            self.transformers_available = True
-        except ImportError:
-            logger.debug("Transformers not installed. LLM/Deepfake features disabled.")
-        
-        try:
-            import music21
-            self.music21_available = True
-        except ImportError:
-            logger.debug("music21 not installed. MIDI analysis disabled.")
-        
-        try:
-            import pretty_midi
-            self.pretty_midi_available = True
-        except ImportError:
-            logger.debug("pretty_midi not installed. MIDI analysis disabled.")
-        
-        try:
-            import plotly
-            self.plotly_available = True
-        except ImportError:
-            logger.debug("Plotly not installed (optional).")
-        
-        try:
-            import seaborn
-            self.seaborn_available = True
-        except ImportError:
-            logger.debug("Seaborn not installed (optional).")
+        """
+        Detect which optional libraries are installed.
         
-        try:
-            import demucs
-            self.demucs_available = True
-        except ImportError:
-            logger.debug("Demucs not installed. Source separation disabled.")
+        Uses import specs rather than importing, so heavy packages (torch,
+        essentia) are only loaded by the extractors that actually run. A
+        flag therefore means "installed", not "importable": a broken wheel
+        (missing CUDA libraries, ABI mismatch) still reads True, so code that
+        imports the library on a hot path checks `library_importable` first.
+        """
+        for attr, module, message in _OPTIONAL_LIBRARIES:
+            if importlib.util.find_spec(module) is not None:
+                setattr(self, attr, True)
+            else:
+                logger.debug(message)
+
+
+@functools.lru_cache(maxsize=None)
+def library_importable(module: str) -> bool:
+    """
+    True if `module` imports cleanly (imported on the first call only).
+    
+    Complements the find_spec-based FeatureFlags, which only say a package
+    is installed.
+    """
+    try:
+        importlib.import_module(module)
+        return True
+    except (ImportError, OSError) as e:
+        logger.warning(f"Could not import {module}: {e}")
+        return False
 
 
 # ============================================================================
@@ -296,12 +295,18 @@ class ModelConfig:
     # Deepfake detector model
     deepfake_model_id: str = "MelodyMachine/Deepfake-audio-detection-V2"
     
+    # AI music detector model (Suno, Udio, etc.)
+    music_ai_model_id: str = "AI-Music-Detection/ai_music_detection_large_60s"
+    
     # Segment Transformer (placeholder - to be implemented)
     segment_transformer_model_id: str = "segment-transformer-music"  # TBD
     
     # Model inference settings
     max_audio_length_seconds: int = 30  # For quick inference
+    torch_compile: bool = field(default_factory=lambda: os.getenv('MUSICTRUTH_TORCH_COMPILE', '0') == '1')  # Opt-in, pays a one-off compile
     sample_rate: int = 16000  # Standard for most models
+    # f0 tracker for vocal analysis: "pyin" (CPU) or "torchcrepe" (CUDA, falls back to pyin)
+    pitch_backend: str = field(default_factory=lambda: os.getenv('MUSICTRUTH_PITCH_BACKEND', 'pyin'))
     
     # Ensemble settings
     ensemble_weights: Dict[str, float] = field(default_factory=lambda: {
@@ -344,34 +349,70 @@ class PathConfig:
 # API Configuration
 # ============================================================================
 
-@dataclass
+def _env(name: str, default: Any = None, cast: Any = str):
+    """Dataclass field defaulting to the import-time value of an env var."""
+    raw = _ENV.get(name)
+    value = cast(raw) if raw is not None else default
+    return field(default=value, metadata={'env': (name, default, cast)})
+
+
+@dataclass(frozen=True, slots=True)
 class APIConfig:
     """API keys and configuration loaded from environment variables."""
     
     # LLM Providers
-    gemini_api_key: Optional[str] = field(default_factory=lambda: os.getenv('GEMINI_API_KEY'))
-    gemini_model: str = field(default_factory=lambda: os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-exp'))
+    gemini_api_key: Optional[str] = _env('GEMINI_API_KEY')
+    gemini_model: str = _env('GEMINI_MODEL', 'gemini-2.0-flash-exp')
     
-    openai_api_key: Optional[str] = field(default_factory=lambda: os.getenv('OPENAI_API_KEY'))
-    openai_model: str = field(default_factory=lambda: os.getenv('OPENAI_MODEL', 'gpt-4'))
+    openai_api_key: Optional[str] = _env('OPENAI_API_KEY')
+    openai_model: str = _env('OPENAI_MODEL', 'gpt-4')
     
-    anthropic_api_key: Optional[str] = field(default_factory=lambda: os.getenv('ANTHROPIC_API_KEY'))
-    anthropic_model: str = field(default_factory=lambda: os.getenv('ANTHROPIC_MODEL', 'claude-3-5-sonnet-20241022'))
+    anthropic_api_key: Optional[str] = _env('ANTHROPIC_API_KEY')
+    anthropic_model: str = _env('ANTHROPIC_MODEL', 'claude-3-5-sonnet-20241022')
     
-    default_llm_provider: str = field(default_factory=lambda: os.getenv('DEFAULT_LLM_PROVIDER', 'gemini'))
+    default_llm_provider: str = _env('DEFAULT_LLM_PROVIDER', 'gemini')
     
     # Metadata APIs
-    spotify_client_id: Optional[str] = field(default_factory=lambda: os.getenv('SPOTIFY_CLIENT_ID'))
-    spotify_client_secret: Optional[str] = field(default_factory=lambda: os.getenv('SPOTIFY_CLIENT_SECRET'))
-    musicbrainz_contact: Optional[str] = field(default_factory=lambda: os.getenv('MUSICBRAINZ_CONTACT_EMAIL'))
+    spotify_client_id: Optional[str] = _env('SPOTIFY_CLIENT_ID')
+    spotify_client_secret: Optional[str] = _env('SPOTIFY_CLIENT_SECRET')
+    musicbrainz_contact: Optional[str] = _env('MUSICBRAINZ_CONTACT_EMAIL')
     
     # Analysis defaults
-    default_analysis_mode: str = field(default_factory=lambda: os.getenv('DEFAULT_ANALYSIS_MODE', 'standard'))
-    default_output_formats: str = field(default_factory=lambda: os.getenv('DEFAULT_OUTPUT_FORMATS', 'json,html'))
+    default_analysis_mode: str = _env('DEFAULT_ANALYSIS_MODE', 'standard')
+    default_output_formats: str = _env('DEFAULT_OUTPUT_FORMATS', 'json,html')
+    # Forked processes for analyze_batch (1: serial); opt-in for the same fork
+    # caveat as extractor_processes
+    analysis_workers: int = _env('ANALYSIS_WORKERS', 1, int)
+    extractor_threads: int = _env('EXTRACTOR_THREADS', os.cpu_count() or 1, int)
+    # Fan a single file's extractors out to this many forked processes (0/1: threads only)
+    extractor_processes: int = _env('EXTRACTOR_PROCESSES', 0, int)
+    # scipy.fft worker threads per transform (-1: all cores); pool workers use 1
+    fft_workers: int = _env('FFT_WORKERS', -1, int)
+    
+    # provider -> (api_key, model), built once in __post_init__
+    _llm: Dict[str, tuple] = field(init=False, repr=False, compare=False)
+    
+    @classmethod
+    def from_env(cls) -> "APIConfig":
+        """Build a config from the live environment rather than the import-time snapshot."""
+        values = {}
+        for f in fields(cls):
+            if not f.init:
+                continue
+            name, default, cast = f.metadata['env']
+            raw = os.getenv(name)
+            values[f.name] = cast(raw) if raw is not None else default
+        return cls(**values)
     
     def __post_init__(self):
-        """Validate API keys after initialization."""
+        """Validate API keys and build the provider table after initialization."""
         self._validate_keys()
+        # Frozen dataclass: set the derived field through object.__setattr__
+        object.__setattr__(self, '_llm', {
+            'gemini': (self.gemini_api_key, self.gemini_model),
+            'openai': (self.openai_api_key, self.openai_model),
+            'anthropic': (self.anthropic_api_key, self.anthropic_model),
+        })
 
     def _validate_keys(self):
         """Perform basic format validation on API keys."""
@@ -392,16 +433,7 @@ class APIConfig:
 
     def get_llm_config(self, provider: Optional[str] = None) -> tuple[Optional[str], str]:
         """Get API key and model for specified provider (or default)."""
-        provider = provider or self.default_llm_provider
-        
-        if provider == 'gemini':
-            return self.gemini_api_key, self.gemini_model
-        elif provider == 'openai':
-            return self.openai_api_key, self.openai_model
-        elif provider == 'anthropic':
-            return self.anthropic_api_key, self.anthropic_model
-        else:
-            return None, ''
+        return self._llm.get(provider or self.default_llm_provider, (None, ''))
     
     def has_spotify_credentials(self) -> bool:
         """Check if Spotify credentials are configured."""
@@ -420,8 +452,23 @@ class Config:
         self.thresholds = DetectionThresholds()
         self.models = ModelConfig()
         self.paths = PathConfig()
-        self.api = APIConfig()
+        self.api = APIConfig.from_env() if _ENV_CACHE_DISABLED else APIConfig()
         self.mode_features = MODE_FEATURES
+        
+        # Map features to required libraries (flags are fixed after detection)
+        ml_available = self.features.torch_available and self.features.transformers_available
+        self._feature_requirements = {
+            'audioflux_features': self.features.audioflux_available,
+            'essentia_features': self.features.essentia_available,
+            'ml_quick_check': ml_available,
+            'ml_full_inference': ml_available,
+            'ml_ensemble': ml_available,
+            'segment_transformer': ml_available,
+            'source_separation': self.features.demucs_available,
+            'midi_extraction': self.features.music21_available,
+            'key_detection': self.features.essentia_available,
+            'chord_analysis': self.features.essentia_available,
+        }
     
     def get_features_for_mode(self, mode: AnalysisMode) -> List[str]:
         """
@@ -445,41 +492,35 @@ class Config:
         Returns:
             bool: True if all required libraries are present.
         """
-        # Map features to required libraries
-        feature_requirements = {
-            'audioflux_features': self.features.audioflux_available,
-            'essentia_features': self.features.essentia_available,
-            'ml_quick_check': self.features.torch_available and self.features.transformers_available,
-            'ml_full_inference': self.features.torch_available and self.features.transformers_available,
-            'ml_ensemble': self.features.torch_available and self.features.transformers_available,
-            'segment_transformer': self.features.torch_available and self.features.transformers_available,
-            'source_separation': self.features.demucs_available,
-            'midi_extraction': self.features.music21_available,
-            'key_detection': self.features.essentia_available,
-            'chord_analysis': self.features.essentia_available,
-        }
-        
-        return feature_requirements.get(feature_name, True)  # Default to available
+        return self._feature_requirements.get(feature_name, True)  # Default to available
     
     def print_status(self):
         """Print configuration status for debugging."""
-        print("=" * 60)
-        print("MusicTruth Configuration Status")
-        print("=" * 60)
-        print("\nLibrary Availability:")
-        print(f"  ✓ librosa: {self.features.librosa_available}")
-        print(f"  {'✓' if self.features.audioflux_available else '✗'} audioFlux: {self.features.audioflux_available}")
-        print(f"  {'✓' if self.features.essentia_available else '✗'} Essentia: {self.features.essentia_available}")
-        print(f"  {'✓' if self.features.torch_available else '✗'} PyTorch: {self.features.torch_available}")
-        print(f"  {'✓' if self.features.transformers_available else '✗'} Transformers: {self.features.transformers_available}")
-        print(f"  {'✓' if self.features.demucs_available else '✗'} Demucs: {self.features.demucs_available}")
-        print(f"  {'✓' if self.features.music21_available else '✗'} music21: {self.features.music21_available}")
-        print(f"  {'✓' if self.features.plotly_available else '✗'} Plotly: {self.features.plotly_available}")
-        print("\nPaths:")
-        print(f"  Input: {self.paths.input_dir}")
-        print(f"  Output: {self.paths.output_dir}")
-        print(f"  Cache: {self.paths.cache_dir}")
-        print("=" * 60)
+        f = self.features
+        libraries = [
+            ("audioFlux", f.audioflux_available),
+            ("Essentia", f.essentia_available),
+            ("PyTorch", f.torch_available),
+            ("Transformers", f.transformers_available),
+            ("Demucs", f.demucs_available),
+            ("music21", f.music21_available),
+            ("Plotly", f.plotly_available),
+        ]
+        lines = [
+            "=" * 60,
+            "MusicTruth Configuration Status",
+            "=" * 60,
+            "\nLibrary Availability:",
+            f"  ✓ librosa: {f.librosa_available}",
+            *(f"  {'✓' if available else '✗'} {name}: {available}" for name, available in libraries),
+            "\nPaths:",
+            f"  Input: {self.paths.input_dir}",
+            f"  Output: {self.paths.output_dir}",
+            f"  Cache: {self.paths.cache_dir}",
+            "=" * 60,
+        ]
+        # One write instead of a print (and flush) per line
+        print("\n".join(lines))
 
 
 # Create global config instance
@@ -5,12 +5,265 @@ Orchestrates the feature extraction process based on selected Analysis Mode.
 """
 
 import os
+import re
+import atexit
+import json
+import hashlib
+import functools
+import dataclasses
+import importlib
+import multiprocessing
+from multiprocessing import shared_memory
+import librosa
 import numpy as np
-from typing import Dict, Any, List, Optional
+from operator import attrgetter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, Callable
 from src.utils.logger import logger
 
 from src.config import config, AnalysisMode, Genre, GENRE_PROFILES
-from .features.base import FeatureResult, load_audio
+from .features.base import (AudioLoadError, FeatureResult, cuda_available, dump_json, fft_frequencies, force_cpu,
+                            load_audio, load_json, mel_power_db, resample_audio, stft_magnitude)
+from .features.spectral import compute_spectral_bundle
+from .features.temporal import compute_tempogram
+from .features.vocal import compute_pyin, compute_yin, pitch_backend
+
+# Longest stretch of audio (seconds) that QUICK mode analyzes
+QUICK_MAX_DURATION_SECONDS = 60
+
+# Shared intermediates, computed at most once per file and injected into the
+# extractors that list them in `requires`.
+# name -> (dependencies, producer(y, sr, *dependency_values))
+PRIMITIVE_PRODUCERS: Dict[str, Tuple[Tuple[str, ...], Callable[..., Any]]] = {
+    "S": ((), lambda y, sr: stft_magnitude(y)),
+    "freqs": (("S",), lambda y, sr, S: fft_frequencies(sr, 2 * (S.shape[0] - 1))),
+    "mean_spectrum": (("S",), lambda y, sr, S: S.mean(axis=1, dtype=np.float32)),
+    "spectral_bundle": (("S", "freqs"), lambda y, sr, S, freqs: compute_spectral_bundle(S, freqs, y, sr)),
+    "mel_db": (("S",), lambda y, sr, S: mel_power_db(S, sr)),
+    "onset_env": (("mel_db",), lambda y, sr, mel_db: librosa.onset.onset_strength(S=mel_db, sr=sr)),
+    "tempogram": (("onset_env",), lambda y, sr, onset_env: compute_tempogram(onset_env, sr)),
+    # Autocorrelation tempo alone; beat_track reuses it instead of re-estimating
+    "tempo": (("tempogram",), lambda y, sr, tempogram: librosa.feature.tempo(tg=tempogram, sr=sr)),
+    "beat_track": (("onset_env", "tempo"),
+                   lambda y, sr, onset_env, tempo: librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, bpm=tempo)),
+    "chroma_cqt": ((), lambda y, sr: librosa.feature.chroma_cqt(y=y, sr=sr)),
+    "chroma_stft": (("S",), lambda y, sr, S: librosa.feature.chroma_stft(S=S ** 2, sr=sr)),
+    "pyin": ((), compute_pyin),
+    "yin": ((), compute_yin),
+}
+
+
+# Content-addressed disk cache for the primitives that cost far more to
+# compute than to read back (opt out with MUSICTRUTH_DISABLE_FEATURE_CACHE=1).
+# S and its cheap derivatives are recomputed: reading them is not faster.
+FEATURE_CACHE_DIR = Path(config.paths.cache_dir) / "features"
+FEATURE_CACHE_ENABLED = not os.getenv('MUSICTRUTH_DISABLE_FEATURE_CACHE')
+CACHED_PRIMITIVES = frozenset({"mel_db", "onset_env", "chroma_cqt", "chroma_stft", "pyin"})
+# Bump when a producer of a cached primitive (or anything upstream, like S) changes its output
+FEATURE_CACHE_VERSION = 1
+# Primitives whose producer depends on configuration; the tag joins their cache entry name
+PRIMITIVE_CACHE_VARIANTS: Dict[str, Callable[[], str]] = {"pyin": pitch_backend}
+
+
+def _audio_digest(y: np.ndarray, sr: int) -> str:
+    """Hash of the decoded samples and cache version; shared by every cached primitive of one signal."""
+    h = hashlib.blake2b(np.ascontiguousarray(y).data, digest_size=16)
+    h.update(f"{FEATURE_CACHE_VERSION}{y.dtype}{y.shape}{sr}{librosa.__version__}".encode())
+    return h.hexdigest()
+
+
+def _cached_primitive(name: str, digest: str, produce: Callable[[], Any]) -> Any:
+    """
+    Load primitive `name` of the signal hashed to `digest` from disk, or produce and store it.
+    
+    Arrays (or tuples of arrays) are stored as .npz, floating point ones as
+    float32 (boolean masks keep their dtype); any cache I/O failure falls
+    back to computing.
+    """
+    path = FEATURE_CACHE_DIR / f"{digest}_{name}.npz"
+    try:
+        with np.load(path) as stored:
+            arrays = [stored[f"arr_{i}"] for i in range(len(stored.files))]
+        return arrays[0] if len(arrays) == 1 else tuple(arrays)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug(f"Feature cache entry {path.name} unreadable: {e}")
+        
+    value = produce()
+    try:
+        arrays = value if isinstance(value, tuple) else (value,)
+        FEATURE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, *(a.astype(np.float32, copy=False) if a.dtype.kind == 'f' else a for a in arrays))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.debug(f"Could not cache primitive {name}: {e}")
+    return value
+
+
+def _primitive_order(names) -> List[str]:
+    """Topological order of `names` plus everything they transitively depend on."""
+    order, seen = [], set()
+    
+    def visit(name: str):
+        if name in seen:
+            return
+        seen.add(name)
+        for dep in PRIMITIVE_PRODUCERS[name][0]:
+            visit(dep)
+        order.append(name)
+        
+    for name in sorted(names):
+        visit(name)
+    return order
+
+
+# Extractor modules as (module, getter, required config.features flags). Modules
+# whose flags are off are never imported, so torch/essentia stay unloaded.
+_GETTER_SPECS: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("spectral", "get_spectral_extractors", ()),
+    ("temporal", "get_temporal_extractors", ()),
+    ("harmonic", "get_harmonic_extractors", ()),
+    ("vocal", "get_vocal_extractors", ()),
+    ("structural", "get_structural_extractors", ()),
+    ("midi_features", "get_midi_extractors", ()),
+    ("provider_fingerprint", "get_provider_extractors", ()),
+    ("essentia_extractor", "get_essentia_extractors", ("essentia_available",)),
+    ("transcription", "get_midi_extractors", ("music21_available", "pretty_midi_available")),
+    ("deepfake", "get_dl_detectors", ("torch_available",)),
+    ("forensic", "get_forensic_extractors", ()),
+]
+
+
+# Genre-profile weight applied to each extractor family (keyed by name keyword)
+GENRE_WEIGHT_KEYWORD_RE = re.compile(r'tempo|mfcc|contrast|vocal|quantization')
+GENRE_WEIGHT_ATTRS = {
+    'tempo': attrgetter('tempo_stability_weight'),
+    'mfcc': attrgetter('mfcc_uniformity_weight'),
+    'contrast': attrgetter('spectral_contrast_weight'),
+    'vocal': attrgetter('vocal_artifact_weight'),
+    'quantization': attrgetter('vocal_artifact_weight'),
+}
+
+
+# Content-addressed cache of finished analyses (opt out with MUSICTRUTH_DISABLE_ANALYZE_CACHE=1)
+ANALYZE_CACHE_DIR = Path(config.paths.cache_dir) / "analyze"
+ANALYZE_CACHE_ENABLED = not os.getenv('MUSICTRUTH_DISABLE_ANALYZE_CACHE')
+# Bump when extractor output changes so stale entries are ignored
+ANALYZE_CACHE_VERSION = 21
+# Bytes hashed from the head of each file (size and mtime cover the rest)
+_CACHE_HASH_BYTES = 1 << 20
+
+
+def _cache_key(file_path: str, mode: AnalysisMode, extractor_names: Tuple[str, ...],
+               metadata: Optional[Dict]) -> str:
+    """Key an analysis by file content, mode, active extractors, metadata (genre weighting) and pitch backend."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        h.update(f.read(_CACHE_HASH_BYTES))
+    h.update(json.dumps([ANALYZE_CACHE_VERSION, st.st_size, st.st_mtime_ns, mode.value,
+                         extractor_names, metadata or {}, pitch_backend()], sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _limit_worker_threads(**limits: int) -> None:
+    """Lower config.api thread counts in a pool worker, whose pool already splits the cores."""
+    config.api = dataclasses.replace(config.api, **limits)
+
+
+def _init_analysis_worker() -> None:
+    """
+    Pool initializer for analyze_batch workers (forked after the batched GPU detector ran).
+    
+    The pool already spreads files over the cores, so each worker runs its
+    extractors and FFTs single-threaded instead of N x N x N threads.
+    """
+    force_cpu()
+    _limit_worker_threads(extractor_threads=1, fft_workers=1)
+
+
+def _analyze_in_worker(args) -> Optional[Dict[str, Any]]:
+    """Run `analyze_audio` in a worker process, reusing one Analyzer per process."""
+    file_path, mode, metadata, precomputed = args
+    try:
+        return get_analyzer().analyze_audio(file_path, mode=mode, metadata=metadata, precomputed=precomputed)
+    except Exception as e:
+        logger.error(f"Analysis failed for {file_path}: {e}")
+        logger.debug(e, exc_info=True)
+        return None
+
+
+# Arrays at least this large reach extractor processes through shared memory;
+# smaller values (tempo, beat frames, kwargs) are simply pickled
+_SHM_MIN_BYTES = 1 << 16
+
+
+class _SharedArray(NamedTuple):
+    """Picklable handle to an ndarray placed in a shared memory segment."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def _to_shared(value: Any, segments: Dict[int, Any]) -> Any:
+    """Replace large arrays in `value` (or a tuple of them) by shared memory handles, once per object."""
+    if isinstance(value, np.ndarray) and value.nbytes >= _SHM_MIN_BYTES:
+        if id(value) not in segments:
+            shm = shared_memory.SharedMemory(create=True, size=value.nbytes)
+            np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)[...] = value
+            segments[id(value)] = (shm, _SharedArray(shm.name, value.shape, value.dtype.str))
+        return segments[id(value)][1]
+    if isinstance(value, tuple):
+        return tuple(_to_shared(v, segments) for v in value)
+    return value
+
+
+def _from_shared(value: Any, handles: List[Any]) -> Any:
+    """Inverse of _to_shared in a worker: read-only views onto the parent's segments."""
+    if isinstance(value, _SharedArray):
+        shm = shared_memory.SharedMemory(name=value.name)
+        handles.append(shm)
+        arr = np.ndarray(value.shape, dtype=np.dtype(value.dtype), buffer=shm.buf)
+        arr.flags.writeable = False
+        return arr
+    if isinstance(value, tuple):
+        return tuple(_from_shared(v, handles) for v in value)
+    return value
+
+
+# Analyzer that owns this extractor worker's pool, bound by _init_extractor_worker
+_WORKER_ANALYZER: Optional["Analyzer"] = None
+
+
+def _init_extractor_worker(analyzer: "Analyzer") -> None:
+    """Pool initializer: resolve extractor names against the Analyzer that forked this worker."""
+    global _WORKER_ANALYZER
+    _WORKER_ANALYZER = analyzer
+    force_cpu()
+    _limit_worker_threads(fft_workers=1)
+
+
+def _extract_in_worker(name: str, target_audio: str, y: Any, sr: int,
+                       kwargs: Dict[str, Any]) -> FeatureResult:
+    """Run one extractor of the owning Analyzer on audio and primitives shared by the parent."""
+    handles: List[Any] = []
+    try:
+        y = _from_shared(y, handles)
+        kwargs = {k: _from_shared(v, handles) for k, v in kwargs.items()}
+        return _WORKER_ANALYZER.extractors[name].extract(target_audio, y=y, sr=sr, **kwargs)
+    finally:
+        del y, kwargs
+        for shm in handles:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # a result still references the buffer; the mapping goes with the process
+
 
 class Analyzer:
     """
@@ -18,49 +271,173 @@ class Analyzer:
     Orchestrates feature extraction and ML inference.
     """
     
+    # Loaded extractor maps, keyed by the feature flags they were built under
+    _extractor_cache: Dict[Tuple[bool, ...], Dict[str, Any]] = {}
+    
     def __init__(self):
-        self.extractors = {}
-        # Delay loading extractors until needed or instantiated
-        self._load_extractors()
+        # Delay loading extractors until the first analysis needs them
+        self._extractors: Optional[Dict[str, Any]] = None
+        self._mode_extractors: Dict[AnalysisMode, List[str]] = {}
+        self._process_pool: Optional[ProcessPoolExecutor] = None
         
-    def _load_extractors(self):
-        """Load all available feature extractors into a map."""
-        try:
-            from .features.spectral import get_spectral_extractors
-            from .features.temporal import get_temporal_extractors
-            from .features.harmonic import get_harmonic_extractors
-            from .features.vocal import get_vocal_extractors
-            from .features.structural import get_structural_extractors
-            from .features.midi_features import get_midi_extractors
-            from .features.provider_fingerprint import get_provider_extractors
-            from .features.essentia_extractor import get_essentia_extractors
-            from .features.transcription import get_midi_extractors as get_transcription_extractors
-            from .features.deepfake import get_dl_detectors
-            from .features.forensic import get_forensic_extractors
+    @property
+    def extractors(self) -> Dict[str, Any]:
+        if self._extractors is None:
+            self._extractors = self._load_extractors()
+        return self._extractors
+        
+    @classmethod
+    def _load_extractors(cls) -> Dict[str, Any]:
+        """Load all available feature extractors into a map (shared across instances)."""
+        flags = sorted({f for _, _, required in _GETTER_SPECS for f in required})
+        key = tuple(getattr(config.features, f) for f in flags)
+        if key in cls._extractor_cache:
+            return cls._extractor_cache[key]
             
-            all_getters = [
-                get_spectral_extractors,
-                get_temporal_extractors,
-                get_harmonic_extractors,
-                get_vocal_extractors,
-                get_structural_extractors,
-                get_midi_extractors,
-                get_provider_extractors,
-                get_essentia_extractors,
-                get_transcription_extractors,
-                get_dl_detectors,
-                get_forensic_extractors
-            ]
+        extractors = {}
+        for mod_name, attr, required in _GETTER_SPECS:
+            if not all(getattr(config.features, f) for f in required):
+                continue
+            try:
+                module = importlib.import_module(f".features.{mod_name}", __package__)
+            except (ImportError, OSError) as e:
+                # Flags only mean "installed"; a broken wheel fails here
+                logger.warning(f"Could not load some extractors: {e}")
+                continue
+            for extractor in getattr(module, attr)():
+                if extractor.is_available():
+                    extractors[extractor.name] = extractor
+                    
+        cls._extractor_cache[key] = extractors
+        return extractors
+
+    def _extractors_for(self, mode: AnalysisMode) -> List[str]:
+        """Names of the extractors that run in `mode`, in registration order (built once per mode)."""
+        if mode not in self._mode_extractors:
+            self._mode_extractors[mode] = [name for name in self.extractors if self._should_run(name, mode)]
+        return self._mode_extractors[mode]
+
+    def _should_run(self, name: str, mode: AnalysisMode) -> bool:
+        """Decide whether the extractor called `name` runs in `mode`."""
+        # Forensic extractors only run in FORENSIC mode
+        if "forensic" in name:
+            return mode == AnalysisMode.FORENSIC
+        if mode in (AnalysisMode.FORENSIC, AnalysisMode.DEEP, AnalysisMode.CUSTOM):
+            return True
+        if mode == AnalysisMode.STANDARD:
+            return not any(k in name for k in ['structural', 'midi', 'provider', 'forensic'])
+        if mode == AnalysisMode.QUICK:
+            # 'ml_quick_check': the AI detector only when a GPU keeps it cheap
+            if name == "music_ai_detector":
+                return self._gpu_inference_available()
+            return any(k in name for k in ['cutoff', 'peak', 'tempo'])
+        return False
+
+    def _extractor_process_pool(self) -> Optional[ProcessPoolExecutor]:
+        """
+        Forked worker pool for per-file extractor fan-out, or None to use threads.
+        
+        Only used when EXTRACTOR_PROCESSES > 1, the platform can fork and this
+        is not itself a pool worker. Workers are forked from this Analyzer with
+        its extractors already loaded, and the initializer binds them to it, so
+        they neither re-import extractors nor fall back to the get_analyzer()
+        singleton. Workers run on CPU, since a forked child cannot reuse a CUDA
+        context the parent initialized.
+        
+        Fork copies only the calling thread: a lock held by another thread of
+        this process at fork time (torch's intra-op pool, a thread pool of an
+        earlier analysis) stays locked in the child. Workers only run the
+        "thread"-mode NumPy/librosa extractors, which do not take those locks,
+        but that is why the pool is opt-in rather than the default.
+        """
+        if self._process_pool is None:
+            if (config.api.extractor_processes <= 1
+                    or 'fork' not in multiprocessing.get_all_start_methods()
+                    or multiprocessing.parent_process() is not None):
+                return None
+            self.extractors  # load before forking so every worker inherits them
+            self._process_pool = ProcessPoolExecutor(max_workers=config.api.extractor_processes,
+                                                     mp_context=multiprocessing.get_context('fork'),
+                                                     initializer=_init_extractor_worker, initargs=(self,))
+            atexit.register(self.close)
+        return self._process_pool
+    
+    def close(self, wait: bool = True) -> None:
+        """Shut down the extractor process pool, if one was started."""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait, cancel_futures=True)
+            self._process_pool = None
+            atexit.unregister(self.close)
+
+    @staticmethod
+    def _gpu_inference_available() -> bool:
+        """True if ML inference can run on a CUDA device."""
+        return config.is_feature_available('ml_quick_check') and cuda_available()
+
+    def analyze_batch(self, file_paths: List[str], mode: AnalysisMode = AnalysisMode.STANDARD,
+                      metadata: Optional[List[Optional[Dict]]] = None,
+                      max_workers: Optional[int] = None) -> List[Optional[Dict[str, Any]]]:
+        """
+        Analyze several files, batching extractors that support it.
+        
+        Extractors exposing `extract_batch` (e.g. the transformer-based AI
+        detector) run once over the whole list so the model sees full batches;
+        all other extractors run per file through `analyze_audio`, spread
+        across a forked process pool when ANALYSIS_WORKERS (or `max_workers`)
+        is above 1. Like EXTRACTOR_PROCESSES this is opt-in: the batched
+        detector has usually started torch's threads in this process by the
+        time it forks (see `_extractor_process_pool`).
+        
+        Args:
+            file_paths (List[str]): Paths to the audio files.
+            mode (AnalysisMode): The depth of analysis to perform.
+            metadata (Optional[List[Optional[Dict]]]): Per-file metadata, aligned with `file_paths`.
+            max_workers (Optional[int]): Worker processes (defaults to `config.api.analysis_workers`, 1).
             
-            for getter in all_getters:
-                for extractor in getter():
-                    if extractor.is_available():
-                        self.extractors[extractor.name] = extractor
-                        
-        except ImportError as e:
-            logger.warning(f"Could not load some extractors: {e}")
-
-    def analyze_audio(self, file_path: str, mode: AnalysisMode = AnalysisMode.STANDARD, metadata: Optional[Dict] = None) -> Dict[str, Any]:
+        Returns:
+            List[Optional[Dict[str, Any]]]: Results aligned with `file_paths` (None if analysis failed).
+        """
+        metadata = metadata or [None] * len(file_paths)
+        precomputed = {fp: {} for fp in file_paths}
+        
+        for name in self._extractors_for(mode):
+            extractor = self.extractors[name]
+            if not hasattr(extractor, 'extract_batch'):
+                continue
+            try:
+                batch = extractor.extract_batch(file_paths)
+            except Exception as e:
+                logger.error(f"Batch extractor {name} failed: {e}")
+                continue
+            for fp, res in zip(file_paths, batch):
+                precomputed[fp][name] = res
+                
+        jobs = [(fp, mode, meta, precomputed[fp]) for fp, meta in zip(file_paths, metadata)]
+        
+        # Per-file extraction is CPU-bound librosa/NumPy work, so it can fan out
+        # across processes when asked to. FORENSIC stays serial since stem
+        # separation already saturates the device.
+        workers = min(max_workers or config.api.analysis_workers, len(jobs))
+        if (workers > 1 and mode != AnalysisMode.FORENSIC
+                and 'fork' in multiprocessing.get_all_start_methods()):
+            # Workers run on CPU: the batched detector above may have initialized
+            # CUDA in this process, and a forked child cannot re-initialize it
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                                     initializer=_init_analysis_worker) as ex:
+                return list(ex.map(_analyze_in_worker, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+        
+        all_results = []
+        for fp, _, meta, pre in jobs:
+            try:
+                all_results.append(self.analyze_audio(fp, mode=mode, metadata=meta, precomputed=pre))
+            except Exception as e:
+                logger.error(f"Analysis failed for {fp}: {e}")
+                logger.debug(e, exc_info=True)
+                all_results.append(None)
+        return all_results
+
+    def analyze_audio(self, file_path: str, mode: AnalysisMode = AnalysisMode.STANDARD, metadata: Optional[Dict] = None,
+                      precomputed: Optional[Dict[str, FeatureResult]] = None) -> Dict[str, Any]:
         """
         Analyze audio file using features defined by the mode and metadata for adaptation.
         
@@ -68,16 +445,44 @@ class Analyzer:
             file_path (str): Path to the audio file.
             mode (AnalysisMode): The depth of analysis to perform.
             metadata (Optional[Dict]): Metadata including genre for adaptation.
+            precomputed (Optional[Dict[str, FeatureResult]]): Results already produced by batched extractors.
             
         Returns:
             Dict[str, Any]: Analysis results including features and AI probability.
+            
+        Raises:
+            AudioLoadError: If `file_path` does not exist (a FileNotFoundError).
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
+        cache_path = None
+        # Anything that fell back or failed this run; such results are not cached,
+        # so a transient failure (e.g. a model download) is retried next time
+        failures: List[str] = []
+        if ANALYZE_CACHE_ENABLED:
+            try:
+                key = _cache_key(file_path, mode, tuple(sorted(self._extractors_for(mode))), metadata)
+                cache_path = ANALYZE_CACHE_DIR / f"{key}.json"
+                if cache_path.exists():
+                    cached = load_json(cache_path.read_bytes())
+                    cached["filename"] = os.path.basename(file_path)
+                    return cached
+            except FileNotFoundError as e:
+                raise AudioLoadError(f"File not found: {file_path}") from e
+            except Exception as e:
+                logger.debug(f"Analysis cache unavailable for {file_path}: {e}")
             
-        # 1. Load Audio
+        precomputed = precomputed or {}
+        
+        # 1. Load Audio. QUICK only reads the opening window from disk, and so
+        # does any mode whose extractors all need just their opening seconds
+        duration = QUICK_MAX_DURATION_SECONDS if mode == AnalysisMode.QUICK else None
+        windows = [self.extractors[name].required_duration_sec
+                   for name in self._extractors_for(mode) if name not in precomputed]
+        if windows and all(windows):
+            duration = max(windows) if duration is None else min(duration, max(windows))
         try:
-            y, sr = load_audio(file_path, sr=22050)
+            y, sr = load_audio(file_path, sr=22050, duration=duration)
+        except FileNotFoundError:
+            raise
         except Exception as e:
             logger.error(f"Audio load failed for {file_path}: {e}")
             return {"error": f"Audio load failed: {e}"}
@@ -91,7 +496,10 @@ class Analyzer:
             "metadata": metadata or {}
         }
         
-        scores = []
+        # QUICK triage caps spectral analysis to the opening minute
+        extract_kwargs = {'mode': mode}
+        if mode == AnalysisMode.QUICK:
+            extract_kwargs['max_duration'] = QUICK_MAX_DURATION_SECONDS
         
         # 2. Run Extractors
         # Special handling for FORENSIC mode: Separate stems first
@@ -106,60 +514,201 @@ class Analyzer:
                 if stems:
                     input_file_map.update(stems)
                     logger.info(f"Stems available: {list(stems.keys())}")
+                else:
+                    failures.append("separation")
             except Exception as e:
                 logger.error(f"Forensic separation failed: {e}")
+                failures.append("separation")
 
-        for name, extractor in self.extractors.items():
-            should_run = False
-            target_audio = input_file_map["mix"] # Default to mix
+        # Plan which extractors run, and on which input
+        active = self._extractors_for(mode)
+        tasks = []
+        for name in active:
+            if name in precomputed:
+                continue
+            extractor = self.extractors[name]
+            # Forensic extractors run on their preferred stem if available, or mix if not
+            target_audio = file_path
+            if mode == AnalysisMode.FORENSIC and extractor.preferred_stem:
+                target_audio = input_file_map.get(extractor.preferred_stem, file_path)
+            tasks.append((name, extractor, target_audio))
             
-            # Forensic extractors run on specific stems if available, or mix if not
-            if "forensic" in name:
-                if mode == AnalysisMode.FORENSIC:
-                    should_run = True
-                    # Silence analysis targets 'other' (piano) or 'vocals' if available
-                    # Entropy analysis targets 'other' (piano) or mix
-                    if "silence" in name and "other" in input_file_map:
-                        target_audio = input_file_map["other"]
-                    elif "entropy" in name and "other" in input_file_map:
-                        target_audio = input_file_map["other"]
+        # Decode every stem exactly once up front (N_stems + 1 decodes per file);
+        # extractors share these read-only buffers instead of reloading
+        audio_inputs = {file_path: (y, sr)}
+        needed_stems = {t for _, _, t in tasks} - {file_path}
+        for stem_path in needed_stems:
+            try:
+                audio_inputs[stem_path] = load_audio(stem_path, sr=22050)
+            except Exception as e:
+                logger.error(f"Could not load stem {stem_path}: {e}")
+                failures.append(stem_path)
+        if len(audio_inputs) <= len(needed_stems):
+            # An unreadable stem falls back to the mix rather than skipping its extractors
+            tasks = [(n, ex, t if t in audio_inputs else file_path) for n, ex, t in tasks]
             
-            elif mode == AnalysisMode.FORENSIC:
-                should_run = True
-            elif mode == AnalysisMode.DEEP:
-                should_run = True
-            elif mode == AnalysisMode.STANDARD:
-                if not any(k in name for k in ['structural', 'midi', 'provider', 'forensic']):
-                    should_run = True
-            elif mode == AnalysisMode.QUICK:
-                if any(k in name for k in ['cutoff', 'peak', 'tempo']):
-                    should_run = True
-            elif mode == AnalysisMode.CUSTOM:
-                should_run = True
+        # Extractors that need less bandwidth get one shared lower-rate copy per input and rate
+        resampled: Dict[Tuple[str, int], Tuple[Any, int]] = {}
+        for _, ex, t in tasks:
+            t_y, t_sr = audio_inputs[t]
+            if ex.target_sr and ex.target_sr < t_sr and (t, ex.target_sr) not in resampled:
+                resampled[t, ex.target_sr] = (resample_audio(t_y, t_sr, ex.target_sr), ex.target_sr)
+        
+        # Extractors with a required_duration_sec share one prefix view per input and length
+        truncated: Dict[Tuple[str, float], Tuple[Any, int]] = {}
+        for _, ex, t in tasks:
+            t_y, t_sr = audio_inputs[t]
+            window = ex.required_duration_sec
+            if (window and (t, ex.target_sr) not in resampled
+                    and t_y.shape[-1] > int(window * t_sr) and (t, window) not in truncated):
+                truncated[t, window] = (t_y[..., :int(window * t_sr)], t_sr)
                 
-            if should_run:
+        def input_for(extractor, target_audio) -> Tuple[Any, int, Optional[Dict[str, Any]]]:
+            """(y, sr, primitives or None) that `extractor` analyzes for `target_audio`."""
+            if (target_audio, extractor.target_sr) in resampled:
+                return (*resampled[target_audio, extractor.target_sr], None)
+            window = extractor.required_duration_sec
+            if (target_audio, window) not in truncated:
+                window = None
+            current_y, current_sr = truncated[target_audio, window] if window else audio_inputs[target_audio]
+            return current_y, current_sr, primitive_sets.get(window) if target_audio == file_path else None
+        
+        def compute_primitives(y_in, needed, primitives: Dict[str, Any],
+                               inexact: frozenset = frozenset()) -> Dict[str, Any]:
+            """
+            Fill in the `needed` mix primitives of `y_in`, dependencies first.
+            
+            Anything derived from a seeded primitive in `inexact` is not exactly
+            what `y_in` alone would give, so it is computed but never written to
+            the content-addressed feature cache under `y_in`'s digest.
+            """
+            digest = _audio_digest(y_in, sr) if FEATURE_CACHE_ENABLED and needed & CACHED_PRIMITIVES else None
+            inexact = set(inexact)
+            for pname in _primitive_order(needed):
+                deps, produce = PRIMITIVE_PRODUCERS[pname]
+                if any(d in inexact for d in deps):
+                    inexact.add(pname)
+                if pname in primitives or any(d not in primitives for d in deps):
+                    continue
                 try:
-                    # Load target audio if it's different from the mix we already loaded
-                    current_y, current_sr = y, sr
-                    
-                    if target_audio != file_path:
-                        # We need to load the stem
-                        # Check if we should cache this? For now, load on demand (stems are usually smaller)
-                        try:
-                            current_y, current_sr = load_audio(target_audio, sr=22050)
-                        except Exception as e:
-                            logger.error(f"Could not load stem {target_audio}: {e}")
-                            continue
-
-                    res = extractor.extract(target_audio, y=current_y, sr=current_sr)
-                    results["features"][name] = res.to_dict()
-                    
-                    if res.flags:
-                        results["flags"].extend(res.flags)
-                        
+                    args = (y_in, sr, *(primitives[d] for d in deps))
+                    if digest is not None and pname in CACHED_PRIMITIVES and pname not in inexact:
+                        variant = PRIMITIVE_CACHE_VARIANTS.get(pname)
+                        cache_name = f"{pname}-{variant()}" if variant else pname
+                        primitives[pname] = _cached_primitive(cache_name, digest, lambda: produce(*args))
+                    else:
+                        primitives[pname] = produce(*args)
                 except Exception as e:
-                    logger.error(f"Extractor {name} failed: {e}")
+                    # Extractors recompute from the waveform if a primitive is missing
+                    logger.error(f"Primitive {pname} failed: {e}")
+                    failures.append(pname)
+            return primitives
+        
+        # Compute the mix primitives the active extractors need: one set for the
+        # whole signal (key None) and one per truncation window
+        needed_by_window: Dict[Optional[float], set] = {}
+        for _, ex, t in tasks:
+            if t == file_path and (t, ex.target_sr) not in resampled:
+                window = ex.required_duration_sec if (t, ex.required_duration_sec) in truncated else None
+                needed_by_window.setdefault(window, set()).update(ex.requires_for(mode))
+        primitive_sets: Dict[Optional[float], Dict[str, Any]] = {}
+        if None in needed_by_window:
+            primitive_sets[None] = compute_primitives(y, needed_by_window[None], {})
+        for window, needed in needed_by_window.items():
+            if window is None:
+                continue
+            y_window = truncated[file_path, window][0]
+            # The STFT of the prefix is the leading frames of the full STFT
+            # (up to the last couple of frames at the cut), so slice it if present;
+            # what is derived from the slice stays out of the feature cache
+            full = primitive_sets.get(None, {})
+            seed = {k: full[k] for k in ("freqs",) if k in full}
+            if "S" in full:
+                seed["S"] = full["S"][:, :1 + y_window.shape[-1] // 512]
+            primitive_sets[window] = compute_primitives(y_window, needed, seed,
+                                                        inexact=frozenset({"S"} & seed.keys()))
+            
+        def run(extractor, target_audio) -> FeatureResult:
+            kwargs = dict(extract_kwargs)
+            current_y, current_sr, primitives = input_for(extractor, target_audio)
+            if primitives is not None:
+                kwargs.update({k: primitives[k] for k in extractor.requires_for(mode) if k in primitives})
+            return extractor.extract(target_audio, y=current_y, sr=current_sr, **kwargs)
+        
+        def submit_to_process(extractor, target_audio):
+            """`run` in a worker process, with large arrays passed through shared memory."""
+            kwargs = dict(extract_kwargs)
+            current_y, current_sr, primitives = input_for(extractor, target_audio)
+            if primitives is not None:
+                kwargs.update({k: _to_shared(primitives[k], segments)
+                               for k in extractor.requires_for(mode) if k in primitives})
+            return process_pool.submit(_extract_in_worker, extractor.name, target_audio,
+                                       _to_shared(current_y, segments), current_sr, kwargs)
+        
+        # NumPy/librosa extractors release the GIL in their heavy kernels, so
+        # they run on a thread pool (or forked processes when configured);
+        # "serial" ones (GPU models) stay on this thread.
+        outcomes: Dict[str, Any] = {}
+        threaded = [t for t in tasks if t[1].parallel_mode == "thread"]
+        serial = [t for t in tasks if t[1].parallel_mode != "thread"]
+        process_pool = self._extractor_process_pool() if threaded else None
+        segments: Dict[int, Any] = {}
+        thread_pool = None
+        futures: Dict[Any, str] = {}
+        
+        try:
+            if process_pool is not None:
+                try:
+                    for name, ex, target in threaded:
+                        futures[submit_to_process(ex, target)] = name
+                except (BrokenProcessPool, OSError) as e:
+                    # A dead pool or a full /dev/shm: run this file on threads instead
+                    logger.warning(f"Extractor process pool unavailable, using threads: {e}")
+                    for fut in futures:
+                        fut.cancel()
+                    futures = {}
+                    if isinstance(e, BrokenProcessPool):
+                        self.close(wait=False)
+                    process_pool = None
+            if process_pool is None and threaded:
+                thread_pool = ThreadPoolExecutor(max_workers=max(1, min(len(threaded), config.api.extractor_threads)))
+                futures = {thread_pool.submit(run, ex, target): name for name, ex, target in threaded}
+            for name, ex, target in serial:
+                try:
+                    outcomes[name] = run(ex, target)
+                except Exception as e:
+                    outcomes[name] = e
+            for fut in as_completed(futures):
+                try:
+                    outcomes[futures[fut]] = fut.result()
+                except BrokenProcessPool as e:
+                    # Keep later analyses from submitting to the dead pool
+                    self.close(wait=False)
+                    outcomes[futures[fut]] = e
+                except Exception as e:
+                    outcomes[futures[fut]] = e
+        finally:
+            if thread_pool is not None:
+                thread_pool.shutdown(cancel_futures=True)
+            for shm, _ in segments.values():
+                shm.close()
+                shm.unlink()
                     
+        # Merge on this thread, in registration order, so output is deterministic
+        for name in active:
+            res = precomputed[name] if name in precomputed else outcomes.get(name)
+            if res is None:
+                continue
+            if isinstance(res, Exception):
+                logger.error(f"Extractor {name} failed: {res}")
+                failures.append(name)
+                continue
+            if 'error' in res.metrics:
+                failures.append(name)
+            results["features"][name] = res.to_dict()
+            if res.flags:
+                results["flags"].extend(res.flags)
+                
         # 3. Calculate Aggregate Score with Genre Adaptation
         genre_str = results.get('metadata', {}).get('genre', 'general')
         try:
@@ -170,6 +719,9 @@ class Analyzer:
         profile = GENRE_PROFILES.get(genre_name, GENRE_PROFILES[Genre.GENERAL])
         logger.debug(f"Using adaptation profile for genre: {genre_name.value}")
 
+        # Weighted mean of the positive scores
+        sum_w = 0.0
+        sum_wx = 0.0
         for name, res_dict in results["features"].items():
             if res_dict.get('score', 0) > 0:
                 score = res_dict['score']
@@ -183,20 +735,31 @@ class Analyzer:
                     weight = 4.0 
                 
                 if genre_name != Genre.GENERAL:
-                    if "tempo" in name:
-                        weight *= profile.tempo_stability_weight
-                    elif "mfcc" in name:
-                        weight *= profile.mfcc_uniformity_weight
-                    elif "contrast" in name:
-                        weight *= profile.spectral_contrast_weight
-                    elif "vocal" in name or "quantization" in name:
-                        weight *= profile.vocal_artifact_weight
+                    match = GENRE_WEIGHT_KEYWORD_RE.search(name)
+                    if match:
+                        weight *= GENRE_WEIGHT_ATTRS[match.group()](profile)
                 
-                scores.extend([score] * int(max(1, weight * 10)))
+                sum_w += weight
+                sum_wx += weight * score
 
-        if scores:
-            results["ai_probability"] = float(np.mean(scores))
-        else:
-            results["ai_probability"] = 0.0
+        results["ai_probability"] = float(sum_wx / sum_w) if sum_w > 0 else 0.0
+            
+        if failures:
+            logger.debug(f"Not caching analysis of {file_path}; failed: {failures}")
+        elif cache_path is not None:
+            try:
+                # Write then rename so concurrent workers never read a partial entry
+                ANALYZE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+                tmp_path.write_bytes(dump_json(results))
+                os.replace(tmp_path, cache_path)
+            except Exception as e:
+                logger.debug(f"Could not cache analysis of {file_path}: {e}")
             
         return results
+
+
+@functools.cache
+def get_analyzer() -> Analyzer:
+    """Process-wide Analyzer, so repeated CLI runs and pool workers share loaded extractors."""
+    return Analyzer()
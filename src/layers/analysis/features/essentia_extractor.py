@@ -5,8 +5,11 @@ Leverages the Essentia C++ library (via Python bindings) for high-performance,
 standardized music descriptor extraction.
 """
 
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 from .base import FeatureExtractor, FeatureResult, load_audio
 
@@ -17,6 +20,22 @@ try:
 except ImportError:
     ESSENTIA_AVAILABLE = False
 
+@functools.lru_cache(maxsize=None)
+def _algo_pool() -> ThreadPoolExecutor:
+    """
+    Threads for Danceability, DynamicComplexity and KeyExtractor, created on
+    first use. The three are independent; they only overlap in time if the
+    Essentia build releases the GIL while computing.
+    """
+    return ThreadPoolExecutor(max_workers=3, thread_name_prefix="essentia")
+
+
+def _run_locked(algo: Any, lock: threading.Lock, audio: np.ndarray):
+    """Call a stateful Essentia algorithm while holding its own lock."""
+    with lock:
+        return algo(audio)
+
+
 class EssentiaFeatureExtractor(FeatureExtractor):
     """
     Extracts high-level descriptors using Essentia.
@@ -33,6 +52,23 @@ class EssentiaFeatureExtractor(FeatureExtractor):
             name="essentia_features",
             description="High-level descriptors from the Essentia MIR library"
         )
+        # Algorithm instances are built once per sample rate and reused;
+        # Essentia algorithms are stateful, so each one carries its own lock
+        self._algos: Dict[int, Tuple[Tuple[Any, threading.Lock], ...]] = {}
+        self._lock = threading.Lock()
+        
+    def _ensure_algos(self, sr: int) -> Tuple[Tuple[Any, threading.Lock], ...]:
+        """(algorithm, lock) pairs for Danceability, DynamicComplexity and KeyExtractor at `sr`."""
+        with self._lock:
+            if sr not in self._algos:
+                self._algos[sr] = tuple(
+                    (algo, threading.Lock()) for algo in (
+                        es.Danceability(sampleRate=sr),
+                        es.DynamicComplexity(sampleRate=sr),
+                        es.KeyExtractor(sampleRate=sr),
+                    )
+                )
+            return self._algos[sr]
         
     def is_available(self) -> bool:
         return ESSENTIA_AVAILABLE
@@ -50,30 +86,33 @@ class EssentiaFeatureExtractor(FeatureExtractor):
              return FeatureResult(self.name, metrics={'error': 'Essentia not installed'})
 
         try:
-            # Essentia prefers loading the file itself or converting standard MonoLoader
-            # If we have path, use it.
-            if audio_path:
-                loader = es.MonoLoader(filename=audio_path)
+            # Reuse the already-decoded samples; only decode with MonoLoader
+            # (44.1 kHz) when no audio was passed in
+            if y is not None and sr is not None:
+                # Convert numpy to essentia vector (float32); no copy when load_audio produced it
+                audio = np.ascontiguousarray(y, dtype=np.float32)
+                if audio.ndim > 1:
+                    audio = np.ascontiguousarray(audio.mean(axis=0))
+            elif audio_path:
+                sr = 44100
+                loader = es.MonoLoader(filename=audio_path, sampleRate=sr)
                 audio = loader()
-            elif y is not None:
-                # Convert numpy to essentia vector (float32)
-                audio = y.astype('float32')
             else:
                  return FeatureResult(self.name, metrics={'error': 'No audio input'})
 
-            # 1. Danceability
-            danceability_algo = es.Danceability()
-            danceability, _ = danceability_algo(audio)
+            # The buffer is shared by all three threads: pass a read-only view
+            # so a stray in-place write fails loudly instead of racing, and the
+            # caller's array flags are left untouched
+            audio = audio.view()
+            audio.setflags(write=False)
             
-            # 2. Dynamic Complexity
-            dynamic_complexity_algo = es.DynamicComplexity()
-            dyn_complexity, _ = dynamic_complexity_algo(audio)
-            
-            # 3. Key/Scale (requires spectral peaks usually, but KeyExtractor works directly on audio? 
-            # optimized key extractor typically takes audio or HPCP)
-            # Let's use simple KeyExtractor
-            key_extractor = es.KeyExtractor()
-            key, scale, key_strength = key_extractor(audio)
+            # 1. Danceability, 2. Dynamic Complexity, 3. Key/Scale
+            # (KeyExtractor computes HPCP from the audio internally)
+            futures = [_algo_pool().submit(_run_locked, algo, lock, audio)
+                       for algo, lock in self._ensure_algos(int(sr))]
+            (danceability, _), (dyn_complexity, _), (key, scale, key_strength) = (
+                f.result() for f in futures
+            )
             
             metrics = {
                 'danceability': float(danceability),
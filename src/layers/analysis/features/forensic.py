@@ -3,11 +3,60 @@ Feature extractors for forensic analysis (Silence, Entropy, Pitch Patterns).
 Based on the "Dusk Awakened by Dawn" Technical Analysis Report.
 """
 
+import os
+import functools
 from dataclasses import dataclass
 import numpy as np
-from typing import Dict, Any, List, Optional
+import scipy.stats
+from typing import Dict, Any, List, Optional, Tuple
 from src.utils.logger import logger
-from .base import FeatureExtractor, FeatureResult, load_audio, normalize_score
+from .base import FeatureExtractor, FeatureResult, load_audio_cached, normalize_score
+
+
+def _window(kwargs: Dict[str, Any]) -> Tuple[float, Optional[float]]:
+    """The `offset`/`duration` window (seconds) requested in extractor kwargs."""
+    return kwargs.get('offset', 0.0), kwargs.get('duration')
+
+
+def _chroma_cached(audio_path: str, offset: float, duration: Optional[float],
+                   method: str = "stft") -> np.ndarray:
+    """
+    Chroma of a file window for standalone calls (no preloaded `y`).
+    
+    Computed once per window from the `load_audio_cached` decode; the mtime
+    in the key invalidates it when the file changes.
+    """
+    return _chroma_memo(audio_path, os.stat(audio_path).st_mtime_ns, offset, duration, method)
+
+
+@functools.lru_cache(maxsize=4)
+def _chroma_memo(audio_path: str, mtime_ns: int, offset: float,
+                 duration: Optional[float], method: str) -> np.ndarray:
+    y, sr = load_audio_cached(audio_path, offset=offset, duration=duration)
+    chroma = _chroma(y, sr, method)
+    chroma.flags.writeable = False
+    return chroma
+
+
+def _chroma(y: np.ndarray, sr: int, method: str = "stft") -> np.ndarray:
+    """Pitch-class energy per frame: STFT-based by default, constant-Q with method="cqt"."""
+    import librosa
+    if method == "cqt":
+        return librosa.feature.chroma_cqt(y=y, sr=sr)
+    return librosa.feature.chroma_stft(y=y, sr=sr, n_fft=2048, hop_length=512)
+
+
+# Shorter than one analysis frame, or digital silence throughout (typically
+# a failed decode): nothing to measure, so skip the split / chroma work
+MIN_ANALYSIS_SAMPLES = 2048
+
+
+def _is_empty(y: np.ndarray) -> bool:
+    return y.shape[-1] < MIN_ANALYSIS_SAMPLES or not y.any()
+
+
+def _empty_result(name: str) -> FeatureResult:
+    return FeatureResult(name, 0.0, confidence=0.0, metrics={'error': 'empty/silent audio'})
 
 class SilenceExtractor(FeatureExtractor):
     """
@@ -17,10 +66,21 @@ class SilenceExtractor(FeatureExtractor):
     - Silence Percentage
     - Mean Silence Duration
     - Expressive Gaps (pauses > 0.5s)
+    
+    When called without `y`, the optional `offset`/`duration` kwargs (seconds)
+    restrict decoding to that window of the file.
+    
+    `top_db` is the silence threshold in dB below the loudest frame's RMS
+    (relative to the track's peak, not dBFS); it can be overridden per call
+    with a `top_db` kwarg.
     """
     
-    def __init__(self):
+    # Piano/instrument silences, not the vocal line
+    preferred_stem = "other"
+    
+    def __init__(self, top_db: float = 50.0):
         super().__init__("silence_forensics", "Silence pattern analysis")
+        self.top_db = top_db
         
     def get_required_libraries(self) -> List[str]:
         return ['librosa', 'scipy']
@@ -28,35 +88,39 @@ class SilenceExtractor(FeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None, sr: Optional[int] = None, **kwargs) -> FeatureResult:
         import librosa
         if y is None:
-            y, sr = load_audio(audio_path)
+            offset, duration = _window(kwargs)
+            y, sr = load_audio_cached(audio_path, offset=offset, duration=duration)
+        if _is_empty(y):
+            return _empty_result(self.name)
             
         # 1. Detect Silence
-        # We use a threshold relative to the max amplitude or absolute dB
-        # Report used -50dBFS. Librosa uses amplitude. -50dB ~= 0.003 amplitude
-        threshold_db = 50
-        top_db = threshold_db
+        # Report used -50dBFS; here frames more than top_db below the loudest
+        # frame count as silent (50 dB ~= 0.003 of the peak RMS amplitude)
+        top_db = kwargs.get('top_db', self.top_db)
         
         # Split into non-silent intervals
-        intervals = librosa.effects.split(y, top_db=top_db, frame_length=2048, hop_length=512)
+        if y.ndim == 1:
+            intervals = self._split_by_rms(y, top_db=top_db, frame_length=2048, hop_length=512)
+        else:
+            intervals = librosa.effects.split(y, top_db=top_db, frame_length=2048, hop_length=512)
         
-        # Calculate silence stats
-        total_samples = len(y)
-        non_silent_samples = sum(end - start for start, end in intervals)
+        # Calculate silence stats (one contiguous (n, 2) int64 block, no per-interval Python)
+        intervals = np.ascontiguousarray(intervals, dtype=np.int64).reshape(-1, 2)
+        total_samples = y.shape[-1]
+        non_silent_samples = int(np.diff(intervals, axis=1).sum())
         silent_samples = total_samples - non_silent_samples
         
         silence_pct = (silent_samples / total_samples) * 100
         
         # Calculate duration of GAPS (silences between intervals)
-        gap_durations = []
-        if len(intervals) > 1:
-            for i in range(len(intervals) - 1):
-                # Gap is between end of current and start of next
-                gap_len = intervals[i+1][0] - intervals[i][1]
-                gap_durations.append(gap_len / sr)
+        gap_durations = (intervals[1:, 0] - intervals[:-1, 1]) / sr
+        
+        mean_gap = np.mean(gap_durations) if len(gap_durations) else 0.0
+        std_gap = np.std(gap_durations) if len(gap_durations) else 0.0
+        expressive_gaps = int(np.count_nonzero(gap_durations > 0.5))
         
-        mean_gap = np.mean(gap_durations) if gap_durations else 0.0
-        std_gap = np.std(gap_durations) if gap_durations else 0.0
-        expressive_gaps = sum(1 for g in gap_durations if g > 0.5)
+        # Digital silence: longest run of (near-)exact zero samples
+        max_zero_run = self._longest_zero_run(y) / sr
         
         # Scoring Logic based on Report
         # AI: 11-18% silence, short gaps < 0.11s
@@ -80,7 +144,8 @@ class SilenceExtractor(FeatureExtractor):
             "mean_gap_duration": float(mean_gap),
             "std_gap_duration": float(std_gap),
             "expressive_gaps_count": int(expressive_gaps),
-            "gap_count": len(gap_durations)
+            "gap_count": len(gap_durations),
+            "max_digital_silence_duration": float(max_zero_run)
         }
         
         flags = []
@@ -93,47 +158,108 @@ class SilenceExtractor(FeatureExtractor):
             metrics=metrics,
             flags=flags
         )
+    
+    @staticmethod
+    def _split_by_rms(y: np.ndarray, top_db: float = 60, frame_length: int = 2048,
+                      hop_length: int = 512) -> np.ndarray:
+        """
+        Non-silent (start, end) sample intervals of mono `y`; same result as librosa.effects.split.
+        
+        Frame energies are built from per-hop block energies (einsum, no squared
+        copy of the signal) summed over a running window, instead of reducing
+        every overlapping frame; runs come from the edges of the threshold mask.
+        """
+        n = len(y)
+        pad = frame_length // 2
+        n_frames = 1 + (n + 2 * pad - frame_length) // hop_length
+        if n == 0 or n_frames < 1:
+            return np.empty((0, 2), dtype=np.int64)
+            
+        # Centered, zero-padded frames (librosa.feature.rms with center=True)
+        if frame_length % hop_length == 0:
+            k = frame_length // hop_length
+            yp = np.pad(y, (pad, pad + (-(n + 2 * pad)) % hop_length))
+            blocks = yp.reshape(-1, hop_length)
+            energy = np.concatenate(([0.0], np.cumsum(np.einsum('ij,ij->i', blocks, blocks), dtype=np.float64)))
+            frame_energy = energy[k:k + n_frames] - energy[:n_frames]
+        else:
+            frames = np.lib.stride_tricks.sliding_window_view(np.pad(y, pad), frame_length)[::hop_length]
+            frame_energy = np.einsum('ij,ij->i', frames, frames)
+        rms = np.sqrt(np.maximum(frame_energy, 0.0) / frame_length)
+        
+        # Frame is non-silent if within top_db of the loudest frame (amplitude_to_db with amin=1e-5)
+        amin = 1e-5
+        threshold = max(amin, rms.max()) * 10.0 ** (-top_db / 20.0)
+        non_silent = np.maximum(rms, amin) > threshold
+        
+        edges = np.flatnonzero(np.diff(non_silent.view(np.int8))) + 1
+        if non_silent[0]:
+            edges = np.concatenate(([0], edges))
+        if non_silent[-1]:
+            edges = np.concatenate((edges, [len(non_silent)]))
+        return np.minimum(edges * hop_length, n).reshape(-1, 2)
+    
+    @staticmethod
+    def _longest_zero_run(y: np.ndarray, eps: float = 1e-7) -> int:
+        """Length in samples of the longest run of |y| < eps (branchless run-length encoding)."""
+        z = (np.abs(y) < eps).view(np.int8)
+        # Run boundaries are where the zero mask flips; pad so both ends count
+        edges = np.flatnonzero(np.diff(z, prepend=0, append=0))
+        if len(edges) == 0:
+            return 0
+        # Edges alternate start/end of zero runs
+        return int((edges[1::2] - edges[::2]).max())
 
 class EntropyExtractor(FeatureExtractor):
     """
     Analyzes Shannon entropy of musical information to detect encoding or algorithmic generation.
+    
+    Accepts the same `offset`/`duration` window kwargs as SilenceExtractor.
+    Only the pitch-class energy distribution matters here, so chroma comes
+    from the (shared) STFT; pass chroma_method="cqt" for constant-Q chroma.
     """
     
-    def __init__(self):
+    preferred_stem = "other"
+    
+    def __init__(self, chroma_method: str = "stft"):
         super().__init__("entropy_forensics", "Shannon entropy of pitch classes")
+        self.chroma_method = chroma_method
+        self.requires = ("chroma_cqt",) if chroma_method == "cqt" else ("chroma_stft",)
         
     def get_required_libraries(self) -> List[str]:
         return ['librosa', 'scipy']
         
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None, sr: Optional[int] = None, **kwargs) -> FeatureResult:
-        import librosa
-        if y is None:
-            y, sr = load_audio(audio_path)
-            
-        # Chroma Features (Pitch Classes)
-        chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
+        chroma = kwargs.get(self.requires[0])
+        standalone = y is None and chroma is None
+        if standalone:
+            offset, duration = _window(kwargs)
+            y, sr = load_audio_cached(audio_path, offset=offset, duration=duration)
+        if y is not None and _is_empty(y):
+            return _empty_result(self.name)
+        if chroma is None:
+            # Chroma Features (Pitch Classes)
+            if standalone:
+                chroma = _chroma_cached(audio_path, offset, duration, self.chroma_method)
+            else:
+                chroma = _chroma(y, sr, self.chroma_method)
         
-        # Flatten and normalize to get probability distribution
-        # We aggregate over time to look for global distribution anomalies
-        # OR we look at the sequence as a stream (as per report for "encoding")
+        # Aggregate over time to look for global distribution anomalies:
+        # the (12,) pitch-class profile is the distribution of interest
         
         # Report method: "Mapped notes to binary... Calculated Shannon entropy"
-        # We'll use a simplified version: Entropy of the Chroma Energy Distribution
+        # We'll use a simplified version: Entropy of the Pitch-Class Energy Distribution
         
-        chroma_flat = chroma.flatten()
-        chroma_sum = np.sum(chroma_flat)
-        if chroma_sum == 0:
+        pitch_classes = chroma.sum(axis=1)
+        if not pitch_classes.any():
             return FeatureResult(self.name, 0.0, metrics={"entropy": 0.0})
             
-        prob_dist = chroma_flat / chroma_sum
-        prob_dist = prob_dist[prob_dist > 0] # Avoid log(0)
-        
-        entropy = -np.sum(prob_dist * np.log2(prob_dist))
+        # scipy normalizes and skips empty classes itself
+        entropy = scipy.stats.entropy(pitch_classes, base=2)
         
-        # Normalizing entropy?
-        # Max entropy for 12 bins? No, this is flattened over time. 
-        # A perfectly random signal has very high entropy.
-        # A highly structured (single note repeating) has low entropy.
+        # Bounded by log2(12) ~= 3.585 bits (all pitch classes equally present),
+        # independent of track length.
+        # A highly structured (single note repeating) profile has low entropy.
         
         # Report: 
         # AI: ~0.50
@@ -145,7 +271,7 @@ class EntropyExtractor(FeatureExtractor):
         
         metrics = {
             "shannon_entropy": float(entropy),
-            "distribution_size": len(prob_dist)
+            "distribution_size": int(np.count_nonzero(pitch_classes))
         }
         
         suspicion = 0.0
@@ -157,7 +283,7 @@ class EntropyExtractor(FeatureExtractor):
         # High = Complex audio
         
         # We simplify: standard music usually has variety.
-        if entropy < 1.0: # Very low information content
+        if entropy < 1.0: # Very low information content (energy in ~2 pitch classes)
              suspicion = 0.8
              flags.append(f"Extremely low entropy ({entropy:.2f}): possible encoding or repetitive loop")
         
@@ -9,15 +9,138 @@ import numpy as np
 import librosa
 from typing import Optional, List, Dict, Any
 
-from .base import HarmonicFeatureExtractor, FeatureResult, load_audio, normalize_score
+from .base import (HarmonicFeatureExtractor, FeatureResult, load_audio_cached, normalize_score, stft_magnitude, hann_window,
+                   njit, NUMBA_AVAILABLE)
 
 # Try importing Essentia for advanced features
 try:
     import essentia.standard as es
     ESSENTIA_AVAILABLE = True
-except ImportError:
+except (ImportError, OSError):
     ESSENTIA_AVAILABLE = False
 
+# librosa.decompose.hpss defaults
+HPSS_KERNEL_SIZE = 31
+
+# Krumhansl-Kessler key profiles (tonic first) for Krumhansl-Schmuckler key finding
+KS_MAJOR = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+KS_MINOR = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+NOTE_NAMES = ('C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B')
+
+
+def _key_templates() -> np.ndarray:
+    """24 x 12 rows of z-scored profiles: 12 major keys (C..B), then 12 minor."""
+    T = np.stack([np.roll(KS_MAJOR, i) for i in range(12)] +
+                 [np.roll(KS_MINOR, i) for i in range(12)])
+    T = T - T.mean(axis=1, keepdims=True)
+    return T / np.linalg.norm(T, axis=1, keepdims=True)
+
+
+KEY_TEMPLATES = _key_templates()
+
+
+def estimate_key(chroma_avg: np.ndarray) -> tuple:
+    """
+    Krumhansl-Schmuckler key estimate from a 12-bin mean chroma vector.
+    
+    Returns (key, scale, strength), strength being the Pearson correlation
+    with the winning profile (0.0 for flat chroma).
+    """
+    x = chroma_avg - chroma_avg.mean()
+    norm = np.linalg.norm(x)
+    if norm <= 1e-12:
+        return "Unknown", "Unknown", 0.0
+    scores = KEY_TEMPLATES @ (x / norm)
+    idx = int(scores.argmax())
+    return NOTE_NAMES[idx % 12], 'major' if idx < 12 else 'minor', float(scores[idx])
+
+
+if NUMBA_AVAILABLE:
+    # Serial on purpose: extractors already run on a thread pool, and numba's
+    # parallel backend launched from worker threads blocks interpreter exit
+    @njit(cache=True)
+    def _median_filter_rows(X: np.ndarray, k: int) -> np.ndarray:
+        """
+        Running median of odd width `k` along each row, 'reflect' boundaries
+        (same as scipy.ndimage.median_filter with size (1, k)).
+        
+        Each row keeps a sorted window and swaps one value per step, which
+        is O(k) per output instead of a full selection.
+        """
+        n_rows, n = X.shape
+        h = k // 2
+        out = np.empty_like(X)
+        for r in range(n_rows):
+            row = X[r]
+            window = np.empty(k, dtype=X.dtype)
+            for j in range(k):
+                i = (j - h) % (2 * n)
+                window[j] = row[i if i < n else 2 * n - 1 - i]
+            window.sort()
+            for t in range(n):
+                out[r, t] = window[h]
+                if t + 1 == n:
+                    break
+                i = (t - h) % (2 * n)
+                old = row[i if i < n else 2 * n - 1 - i]
+                i = (t + h + 1) % (2 * n)
+                new = row[i if i < n else 2 * n - 1 - i]
+                # Drop `old` from the sorted window, then insert `new`
+                p = 0
+                while p < k - 1 and window[p] != old:
+                    p += 1
+                while p > 0 and window[p - 1] > new:
+                    window[p] = window[p - 1]
+                    p -= 1
+                while p < k - 1 and window[p + 1] < new:
+                    window[p] = window[p + 1]
+                    p += 1
+                window[p] = new
+        return out
+
+
+def _median_filter(S: np.ndarray, k: int, axis: int) -> np.ndarray:
+    """Median filter of width `k` along `axis` (1 = time, 0 = frequency) of a spectrogram."""
+    if NUMBA_AVAILABLE:
+        if axis == 1:
+            return _median_filter_rows(np.ascontiguousarray(S), k)
+        return _median_filter_rows(np.ascontiguousarray(S.T), k).T
+    import scipy.ndimage
+    return scipy.ndimage.median_filter(S, size=(1, k) if axis == 1 else (k, 1), mode='reflect')
+
+
+def _hpss_energies(S: np.ndarray, n_samples: int, hop_length: int = 512) -> tuple:
+    """
+    Mean-square energies of the harmonic and percussive parts of magnitude STFT `S`.
+    
+    Same median filters and soft masks as librosa.decompose.hpss, but the
+    masked power is summed directly (Parseval, scaled by the Hann overlap)
+    instead of inverting two STFTs back to waveforms.
+    """
+    harm = _median_filter(S, HPSS_KERNEL_SIZE, axis=1)
+    perc = _median_filter(S, HPSS_KERNEL_SIZE, axis=0)
+    harm *= harm
+    perc *= perc
+    total = harm + perc
+    # Where both filters are zero librosa splits the mask evenly
+    tiny = np.finfo(S.dtype).tiny
+    mask_harm = np.divide(harm, total, out=np.full_like(total, 0.5), where=total > tiny)
+    
+    # The masks scale magnitudes, so each part's power is |S|^2 * mask^2
+    power = S * S
+    mask_perc = 1.0 - mask_harm
+    mask_harm *= mask_harm
+    mask_perc *= mask_perc
+    # One-sided -> full-spectrum power: interior bins appear twice
+    weights = np.full(S.shape[0], 2.0)
+    weights[[0, -1]] = 1.0
+    e_harm = float(weights @ (power * mask_harm).sum(axis=1, dtype=np.float64))
+    e_perc = float(weights @ (power * mask_perc).sum(axis=1, dtype=np.float64))
+    
+    n_fft = 2 * (S.shape[0] - 1)
+    scale = n_fft * float(np.sum(hann_window(n_fft) ** 2)) / hop_length * max(n_samples, 1)
+    return e_harm / scale, e_perc / scale
+
 
 class KeyDetectionAnalyzer(HarmonicFeatureExtractor):
     """
@@ -27,6 +150,9 @@ class KeyDetectionAnalyzer(HarmonicFeatureExtractor):
     exhibits unusual key changes or ambiguous tonality.
     """
     
+    # The librosa fallback reads the shared STFT chroma; Essentia reads the waveform
+    requires = () if ESSENTIA_AVAILABLE else ("chroma_stft",)
+    
     def __init__(self):
         super().__init__(
             name="key_detection",
@@ -41,7 +167,7 @@ class KeyDetectionAnalyzer(HarmonicFeatureExtractor):
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract key features."""
         if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
+            y, sr = load_audio_cached(audio_path, sr=22050)
             
         key = "Unknown"
         scale = "Unknown"
@@ -59,7 +185,7 @@ class KeyDetectionAnalyzer(HarmonicFeatureExtractor):
                 # Fallback to librosa
                 return self._extract_librosa(y, sr)
         else:
-            return self._extract_librosa(y, sr)
+            return self._extract_librosa(y, sr, chroma=kwargs.get('chroma_stft'))
             
         return FeatureResult(
             feature_name=self.name,
@@ -73,19 +199,14 @@ class KeyDetectionAnalyzer(HarmonicFeatureExtractor):
             flags=[f"Detected Key: {key} {scale} (Strength: {strength:.2f})"]
         )
 
-    def _extract_librosa(self, y: np.ndarray, sr: int) -> FeatureResult:
+    def _extract_librosa(self, y: np.ndarray, sr: int, chroma: Optional[np.ndarray] = None) -> FeatureResult:
         """Fallback key detection using librosa chroma."""
-        chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
+        if chroma is None:
+            # Same STFT chroma as the shared 'chroma_stft' primitive
+            chroma = librosa.feature.chroma_stft(S=stft_magnitude(y) ** 2, sr=sr)
         chroma_avg = np.mean(chroma, axis=1)
         
-        # Simple heuristic: max chroma bin is the root
-        # This is very basic compared to Essentia/Krumhansl-Schmuckler
-        # Typically we just show the chroma distribution
-        
-        # We can't easily get Key/Scale string without a proper algorithm
-        # reusing music21 or manual implementation
-        
-        # For now, return chroma statistics
+        key, scale, strength = estimate_key(chroma_avg)
         chroma_std = np.std(chroma_avg)
         
         return FeatureResult(
@@ -93,10 +214,13 @@ class KeyDetectionAnalyzer(HarmonicFeatureExtractor):
             score=0.0,
             confidence=0.5,
             metrics={
+                'key': key,
+                'scale': scale,
+                'key_strength': strength,
                 'chroma_std': float(chroma_std),
-                'method': 'librosa_chroma'
+                'method': 'krumhansl_schmuckler'
             },
-            flags=["Using basic chroma analysis (Essentia not available)"]
+            flags=[f"Detected Key: {key} {scale} (Strength: {strength:.2f}, Krumhansl-Schmuckler)"]
         )
 
 class ChordProgressionAnalyzer(HarmonicFeatureExtractor):
@@ -107,6 +231,8 @@ class ChordProgressionAnalyzer(HarmonicFeatureExtractor):
     progressions with little variation.
     """
     
+    requires = ("chroma_cqt",)
+    
     def __init__(self):
         super().__init__(
             name="chord_analysis",
@@ -129,7 +255,7 @@ class ChordProgressionAnalyzer(HarmonicFeatureExtractor):
             )
             
         if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
+            y, sr = load_audio_cached(audio_path, sr=22050)
             
         try:
             # Chords detection using Essentia
@@ -159,18 +285,22 @@ class ChordProgressionAnalyzer(HarmonicFeatureExtractor):
             # We will use simple tonal complexity from librosa as fallback/proxy for now
             # since full chord extraction in Python binding can be involved.
             
-            return self._extract_tonal_complexity(y, sr)
+            return self._extract_tonal_complexity(y, sr, chroma=kwargs.get('chroma_cqt'))
             
         except Exception as e:
-             return self._extract_tonal_complexity(y, sr, error=str(e))
+             return self._extract_tonal_complexity(y, sr, error=str(e), chroma=kwargs.get('chroma_cqt'))
 
-    def _extract_tonal_complexity(self, y: np.ndarray, sr: int, error: str = "") -> FeatureResult:
+    def _extract_tonal_complexity(self, y: np.ndarray, sr: int, error: str = "",
+                                  chroma: Optional[np.ndarray] = None) -> FeatureResult:
         """Fallback using librosa tonal centroid features."""
-        y_harm = librosa.effects.harmonic(y)
-        if len(y_harm) < 2048:
+        if len(y) < 2048:
              return FeatureResult(self.name, metrics={'error': 'Audio too short'})
-             
-        tonnetz = librosa.feature.tonnetz(y=y_harm, sr=sr)
+        
+        # Tonnetz straight from the (shared) chroma of the mix: CQT chroma is
+        # already dominated by harmonic content, so no HPSS + iSTFT pass first
+        if chroma is None:
+            chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
+        tonnetz = librosa.feature.tonnetz(chroma=chroma).astype(np.float32, copy=False)
         
         # Calculate variability of tonal centroid
         # Low variability = repetitive static harmony
@@ -204,6 +334,8 @@ class HPSSAnalyzer(HarmonicFeatureExtractor):
     Analyzes Harmonic-Percussive Source Separation ratio.
     """
     
+    requires = ("S",)
+    
     def __init__(self):
         super().__init__(
             name="hpss_analysis",
@@ -213,13 +345,12 @@ class HPSSAnalyzer(HarmonicFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract HPSS features."""
+        S = kwargs.get('S')
         if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
-            
-        y_harm, y_perc = librosa.effects.hpss(y)
-        
-        e_harm = np.mean(y_harm**2)
-        e_perc = np.mean(y_perc**2)
+            y, sr = load_audio_cached(audio_path, sr=22050)
+        if S is None:
+            S = stft_magnitude(y)
+        e_harm, e_perc = _hpss_energies(S, y.shape[-1])
         
         if e_perc == 0:
             ratio = 0.0
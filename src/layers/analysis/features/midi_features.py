@@ -6,9 +6,9 @@ Converts audio to MIDI and analyzes note patterns.
 
 import numpy as np
 import librosa
-from typing import Optional
+from typing import Optional, Tuple
 
-from .base import FeatureExtractor, FeatureResult, load_audio
+from .base import FeatureExtractor, FeatureResult, load_audio_cached, onset_envelope, stft_magnitude
 
 try:
     import music21
@@ -17,11 +17,53 @@ except ImportError:
     MUSIC21_AVAILABLE = False
 
 
+# onset_strength frame hop (librosa default)
+ONSET_HOP_LENGTH = 512
+# Vector strength of the onsets on the 16th-note grid above which timing is
+# treated as hard-quantized (~5 ms of jitter or less at common tempos)
+QUANTIZED_PERIODICITY = 0.85
+# The autocorrelation tempo is coarse; search this far around its 16th-note rate
+GRID_SEARCH_TOLERANCE = 0.03
+
+
+def onset_grid(onset_frames: np.ndarray, n_frames: int, tempo: float,
+               frame_rate: float) -> Optional[Tuple[float, float, float]]:
+    """
+    (frequency Hz, vector strength, phase) of the 16th-note grid the onsets follow.
+    
+    The Hann-windowed onset train's rFFT bin nearest 4 * tempo / 60 Hz (within
+    GRID_SEARCH_TOLERANCE) is its windowed vector strength at every candidate
+    rate at once. Returns None when that rate is above the frame rate.
+    """
+    train = np.zeros(n_frames)
+    train[onset_frames] = 1.0
+    train *= np.hanning(n_frames)
+    spectrum = np.fft.rfft(train)
+    
+    expected_bin = (4.0 * tempo / 60.0) * n_frames / frame_rate
+    reach = max(2.0, GRID_SEARCH_TOLERANCE * expected_bin)
+    lo = max(int(expected_bin - reach), 1)
+    hi = min(int(expected_bin + reach) + 1, len(spectrum))
+    if lo >= hi:
+        return None
+    peak = lo + int(np.argmax(np.abs(spectrum[lo:hi])))
+    # 1.0 when every onset sits on the grid, ~0 for free timing
+    periodicity = np.abs(spectrum[peak]) / train.sum()
+    return peak * frame_rate / n_frames, float(periodicity), float(np.angle(spectrum[peak]))
+
+
 class MIDIQuantizationAnalyzer(FeatureExtractor):
     """
     Analyzes note timing quantization via Audio-to-MIDI conversion.
+    
+    The 16th-note grid is located in the spectrum of the onset train: the
+    peak near 4 * tempo / 60 Hz gives the grid's exact rate and phase, so
+    onsets are compared against the grid they actually follow rather than
+    one anchored at t = 0.
     """
     
+    requires = ("onset_env", "tempo")
+    
     def __init__(self):
         super().__init__(
             name="midi_quantization",
@@ -36,48 +78,47 @@ class MIDIQuantizationAnalyzer(FeatureExtractor):
         if not MUSIC21_AVAILABLE:
             return FeatureResult(self.name, metrics={'error': 'music21 missing'})
             
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
+        onset_env = kwargs.get('onset_env')
+        if onset_env is None:
+            if y is None or sr is None:
+                y, sr = load_audio_cached(audio_path, sr=22050)
+            onset_env = onset_envelope(stft_magnitude(y), sr)
             
         # Audio to MIDI transcription is a hard problem.
         # We use a simplified onset+pitch approach for analysis
         
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr)
+        onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr)
         if len(onset_frames) < 10:
              return FeatureResult(self.name, score=0.0, metrics={'note_count': 0})
              
-        onset_times = librosa.frames_to_time(onset_frames, sr=sr)
+        onset_times = librosa.frames_to_time(onset_frames, sr=sr, hop_length=ONSET_HOP_LENGTH)
         
         # Analyze grid adherence of onsets
-        # Estimate BPM
-        tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+        # Estimate BPM (tempo only: the dynamic-programming beat tracker is not needed)
+        tempo = kwargs.get('tempo')
+        if tempo is None:
+            tempo = librosa.feature.tempo(onset_envelope=onset_env, sr=sr)
         if hasattr(tempo, 'item'): tempo = tempo.item()
         if tempo <= 0: tempo = 120.0
         
-        beat_duration = 60.0 / tempo
-        
-        # Calculate deviation from nearest 16th note grid
-        sixteenth_duration = beat_duration / 4.0
+        # Strongest component of the onset train around the 16th-note rate
+        grid = onset_grid(onset_frames, len(onset_env), tempo, sr / ONSET_HOP_LENGTH)
+        if grid is None:
+            return FeatureResult(self.name, score=0.0, metrics={'error': 'Grid above onset frame rate'})
+        grid_freq, periodicity, phase = grid
         
-        deviations = []
-        for t in onset_times:
-            # Find nearest grid point (assuming start at 0 for simplicity)
-            # A real implementation aligns the grid phase
-            remainder = t % sixteenth_duration
-            dev = min(remainder, sixteenth_duration - remainder)
-            deviations.append(dev)
-            
-        avg_dev = np.mean(deviations)
-        normalized_dev = avg_dev / sixteenth_duration # 0.0 to 0.5
+        # Distance to the nearest phase-aligned grid point, in grid units (0.0 to 0.5)
+        cycles = np.mod(onset_times * grid_freq + phase / (2 * np.pi), 1.0)
+        normalized_dev = np.minimum(cycles, 1.0 - cycles).mean()
         
-        # Extremely low deviation = Quantized
+        # Sharp, phase-locked grid = Quantized
         score = 0.0
-        if normalized_dev < 0.05:
+        if periodicity >= QUANTIZED_PERIODICITY:
             score = 0.8
             
         flags = []
         if score > 0.5:
-             flags.append(f"Hard MIDI quantization detected (Dev: {normalized_dev:.3f})")
+             flags.append(f"Hard MIDI quantization detected (Periodicity: {periodicity:.2f}, Dev: {normalized_dev:.3f})")
 
         return FeatureResult(
             feature_name=self.name,
@@ -85,7 +126,9 @@ class MIDIQuantizationAnalyzer(FeatureExtractor):
             confidence=0.6,
             metrics={
                 'grid_deviation': float(normalized_dev),
-                'estimated_tempo': float(tempo)
+                'grid_periodicity': float(periodicity),
+                'estimated_tempo': float(tempo),
+                'grid_tempo': float(grid_freq * 15.0)
             },
             flags=flags
         )
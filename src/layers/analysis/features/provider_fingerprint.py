@@ -9,7 +9,11 @@ import numpy as np
 import librosa
 from typing import Optional
 
-from .base import FeatureExtractor, FeatureResult, load_audio, gaussian_score
+from .base import (FeatureExtractor, FeatureResult, STATISTICAL_WINDOW_SECONDS, load_audio_cached, gaussian_score,
+                   stft_magnitude, fft_frequencies)
+
+# Lower edge of the Suno high-frequency "sheen" band
+SUNO_SHEEN_HZ = 16000
 
 class SunoFingerprintDetector(FeatureExtractor):
     """
@@ -20,6 +24,9 @@ class SunoFingerprintDetector(FeatureExtractor):
     - Specific spectral texture
     """
     
+    requires = ("S", "freqs")
+    required_duration_sec = STATISTICAL_WINDOW_SECONDS
+    
     def __init__(self):
         super().__init__(
             name="provider_fingerprint_suno",
@@ -28,20 +35,29 @@ class SunoFingerprintDetector(FeatureExtractor):
         
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=None) # Native SR needed
+        S = kwargs.get('S')
+        if S is None:
+            if y is None or sr is None:
+                y, sr = load_audio_cached(audio_path, sr=None) # Native SR needed
+            S = stft_magnitude(y)
             
         # Check for high-frequency sheen
-        S = np.abs(librosa.stft(y))
-        freqs = librosa.fft_frequencies(sr=sr)
+        freqs = kwargs.get('freqs')
+        if freqs is None:
+            freqs = fft_frequencies(sr, 2 * (S.shape[0] - 1))
         
-        mask_high = freqs > 16000
-        if not np.any(mask_high):
+        # FFT bins ascend, so the band is a suffix: slice a view instead of
+        # copying it out with a boolean mask
+        k0 = int(np.searchsorted(freqs, SUNO_SHEEN_HZ, side='right'))
+        if k0 >= S.shape[0]:
              return FeatureResult(self.name, score=0.0, metrics={'status': 'No high freq'})
              
-        energy_high = np.mean(S[mask_high, :])
-        energy_total = np.mean(S)
+        energy_high = np.mean(S[k0:], dtype=np.float32)
+        energy_total = np.mean(S, dtype=np.float32)
+        return self._build_result(energy_high, energy_total)
         
+    def _build_result(self, energy_high: float, energy_total: float) -> FeatureResult:
+        """Score the high-band to total mean magnitude ratio."""
         ratio = energy_high / energy_total if energy_total > 0 else 0
         
         # Suno often has an unusually flat/noisy high end
@@ -5,12 +5,16 @@ Implements various spectral analysis methods to detect artifacts
 common in AI-generated music.
 """
 
+import functools
+
 import numpy as np
 import librosa
 import scipy.stats
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Tuple
 
-from .base import SpectralFeatureExtractor, FeatureResult, load_audio, gaussian_score, normalize_score
+from .base import (SpectralFeatureExtractor, FeatureResult, STATISTICAL_WINDOW_SECONDS,
+                   load_audio_cached, mel_power_db, normalize_score, step_score, stft_magnitude, fft_frequencies, hann_window,
+                   njit)
 
 # Try importing audioFlux for advanced features
 try:
@@ -19,6 +23,220 @@ try:
 except ImportError:
     AUDIOFLUX_AVAILABLE = False
 
+from src.config import config
+
+
+def _rolloff_from_magnitude(S: np.ndarray, freqs: np.ndarray,
+                            roll_percent: float = 0.99) -> np.ndarray:
+    """Per-frame spectral rolloff from a magnitude spectrogram (librosa semantics)."""
+    cumulative = np.cumsum(S, axis=0)
+    rolloff_bin = np.argmax(cumulative >= roll_percent * cumulative[-1], axis=0)
+    return freqs[rolloff_bin]
+
+
+# librosa.feature.spectral_contrast / zero_crossing_rate defaults
+CONTRAST_N_BANDS = 6
+CONTRAST_FMIN = 200.0
+CONTRAST_QUANTILE = 0.02
+ZCR_FRAME_LENGTH = 2048
+ZCR_HOP_LENGTH = 512
+ZCR_THRESHOLD = 1e-10
+
+# Set bits per byte value, for popcounts on NumPy < 2.0 (no np.bitwise_count)
+_POPCOUNT_U8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+@functools.lru_cache(maxsize=8)
+def _contrast_bands(sr: int, n_fft: int) -> np.ndarray:
+    """
+    (start, stop, quantile_count) bin rows of the spectral contrast sub-bands.
+    
+    Same octave bands and edge adjustments as librosa.feature.spectral_contrast,
+    each of which turns out to be one contiguous run of bins.
+    """
+    freqs = fft_frequencies(sr, n_fft)
+    octa = np.zeros(CONTRAST_N_BANDS + 2)
+    octa[1:] = CONTRAST_FMIN * (2.0 ** np.arange(0, CONTRAST_N_BANDS + 1))
+    bands = np.zeros((CONTRAST_N_BANDS + 1, 3), dtype=np.int64)
+    for k, (f_low, f_high) in enumerate(zip(octa[:-1], octa[1:])):
+        idx = np.flatnonzero((freqs >= f_low) & (freqs <= f_high))
+        start = idx[0] - 1 if k > 0 else idx[0]
+        stop = len(freqs) if k == CONTRAST_N_BANDS else idx[-1] + 1
+        count = max(int(np.rint(CONTRAST_QUANTILE * (stop - start))), 1)
+        if k < CONTRAST_N_BANDS:
+            stop -= 1
+        bands[k] = (start, stop, count)
+    bands.flags.writeable = False
+    return bands
+
+
+@njit(cache=True)
+def _rolloff_contrast_frames(S: np.ndarray, bands: np.ndarray, roll_percent: float):
+    """
+    Rolloff bin and contrast peak/valley per frame in one pass over S.
+    
+    Each frame's column is read once while it is cache-resident: a running
+    float32 sum gives the rolloff bin (as np.cumsum/argmax would), then the
+    `count` lowest/highest magnitudes of each sub-band are kept in small
+    sorted buffers (count is a few bins, so no full sort) and averaged in
+    ascending order, like the mean over np.sort slices.
+    """
+    n_bins, n_frames = S.shape
+    n_bands = bands.shape[0]
+    rolloff_bin = np.zeros(n_frames, dtype=np.int64)
+    valley = np.empty((n_bands, n_frames))
+    peak = np.empty((n_bands, n_frames))
+    max_count = bands[:, 2].max()
+    low = np.empty(max_count, dtype=np.float32)
+    high = np.empty(max_count, dtype=np.float32)
+    for t in range(n_frames):
+        col = S[:, t]
+        total = np.float32(0.0)
+        for i in range(n_bins):
+            total += col[i]
+        threshold = np.float32(roll_percent) * total
+        acc = np.float32(0.0)
+        for i in range(n_bins):
+            acc += col[i]
+            if acc >= threshold:
+                rolloff_bin[t] = i
+                break
+        for k in range(n_bands):
+            start, stop, count = bands[k, 0], bands[k, 1], bands[k, 2]
+            low[:count] = np.inf
+            high[:count] = -np.inf
+            for i in range(start, stop):
+                v = col[i]
+                if v < low[count - 1]:
+                    j = count - 1
+                    while j > 0 and low[j - 1] > v:
+                        low[j] = low[j - 1]
+                        j -= 1
+                    low[j] = v
+                if v > high[0]:
+                    j = 0
+                    while j < count - 1 and high[j + 1] < v:
+                        high[j] = high[j + 1]
+                        j += 1
+                    high[j] = v
+            low_sum = np.float32(0.0)
+            high_sum = np.float32(0.0)
+            for j in range(count):
+                low_sum += low[j]
+                high_sum += high[j]
+            valley[k, t] = low_sum / np.float32(count)
+            peak[k, t] = high_sum / np.float32(count)
+    return rolloff_bin, valley, peak
+
+
+def _zero_crossing_rate(y: np.ndarray) -> np.ndarray:
+    """
+    librosa.feature.zero_crossing_rate (centered, edge-padded) as float32.
+    
+    Sign flips are computed once over the whole signal and bit-packed, eight
+    samples per byte. A popcount per hop-sized block then gives the counts,
+    and each frame sums the blocks it spans (frame and hop are multiples of
+    8, so blocks are byte aligned). Its first sample is not compared with
+    the previous frame, so that flip is subtracted.
+    """
+    pad = ZCR_FRAME_LENGTH // 2
+    y = np.pad(y, (pad, pad), mode='edge')
+    # signbit after zeroing |y| <= threshold, as librosa.zero_crossings does
+    negative = y < -ZCR_THRESHOLD
+    flips = np.empty(len(y), dtype=bool)
+    flips[0] = False
+    np.not_equal(negative[1:], negative[:-1], out=flips[1:])
+    
+    n_blocks = len(y) // ZCR_HOP_LENGTH
+    packed = np.packbits(flips[:n_blocks * ZCR_HOP_LENGTH]).reshape(n_blocks, ZCR_HOP_LENGTH // 8)
+    if hasattr(np, 'bitwise_count'):
+        block_counts = np.bitwise_count(packed).sum(axis=1, dtype=np.int64)
+    else:
+        block_counts = _POPCOUNT_U8[packed].sum(axis=1, dtype=np.int64)
+        
+    n_frames = 1 + (len(y) - ZCR_FRAME_LENGTH) // ZCR_HOP_LENGTH
+    span = ZCR_FRAME_LENGTH // ZCR_HOP_LENGTH
+    counts = sum(block_counts[k:k + n_frames] for k in range(span))
+    counts -= flips[:n_frames * ZCR_HOP_LENGTH:ZCR_HOP_LENGTH]
+    return (counts / ZCR_FRAME_LENGTH).astype(np.float32)
+
+
+def _rolloff_and_contrast(S: np.ndarray, freqs: np.ndarray, sr: int,
+                          roll_percent: float = 0.99) -> Tuple[np.ndarray, np.ndarray]:
+    """99% rolloff (Hz) and spectral contrast (float32) from one fused pass over S."""
+    bands = _contrast_bands(sr, 2 * (S.shape[0] - 1))
+    rolloff_bin, valley, peak = _rolloff_contrast_frames(S, bands, roll_percent)
+    contrast = librosa.power_to_db(peak) - librosa.power_to_db(valley)
+    return freqs[rolloff_bin], contrast.astype(np.float32)
+
+
+def compute_spectral_bundle(S: np.ndarray, freqs: np.ndarray, y: np.ndarray, sr: int) -> Dict[str, np.ndarray]:
+    """
+    Rolloff, spectral contrast and zero-crossing rate for one signal.
+    
+    Shared by FrequencyCutoffDetector, SpectralContrastAnalyzer and
+    ZeroCrossingRateAnalyzer (injected as the 'spectral_bundle' primitive),
+    so S is streamed once for rolloff and contrast together rather than
+    once per extractor.
+    """
+    rolloff, contrast = _rolloff_and_contrast(S, freqs, sr)
+    return {'rolloff': rolloff, 'contrast': contrast, 'zcr': _zero_crossing_rate(y)}
+
+
+def _stream_spectrum(audio_path: str, n_fft: int = 2048, hop_length: int = 512,
+                     block_seconds: float = 30.0, max_duration: Optional[float] = None
+                     ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, int]]:
+    """
+    Accumulate spectral statistics block by block straight from disk.
+    
+    Only one block of audio (and its STFT) is held in memory at a time, so
+    the footprint is constant regardless of track length. The signal is
+    zero-padded by `n_fft // 2` at both ends and the unfinished tail of each
+    block is carried into the next, so the frames are exactly those of the
+    in-memory path (librosa's centred, zero-padded framing).
+    
+    Returns:
+        (mean_spectrum, rolloff_per_frame, freqs, sr) at the native sample
+        rate, or None if soundfile cannot decode the file.
+    """
+    import soundfile as sf
+    
+    try:
+        sr = sf.info(audio_path).samplerate
+    except Exception:
+        return None
+    
+    blocksize = max(1, int(block_seconds * sr) // hop_length) * hop_length
+    frames = int(max_duration * sr) if max_duration else -1
+    freqs = fft_frequencies(sr, n_fft)
+    pad = np.zeros(n_fft // 2, dtype=np.float32)
+    
+    spectrum_sum = np.zeros(len(freqs), dtype=np.float64)
+    rolloffs = []
+    n_frames = 0
+    
+    def consume(buf: np.ndarray) -> np.ndarray:
+        """Analyse every whole frame in `buf`; return the samples the next frame starts at."""
+        nonlocal spectrum_sum, n_frames
+        if len(buf) < n_fft:
+            return buf
+        S = np.abs(librosa.stft(buf, n_fft=n_fft, hop_length=hop_length, window=hann_window(n_fft), center=False))
+        spectrum_sum += S.sum(axis=1)
+        n_frames += S.shape[1]
+        rolloffs.append(_rolloff_from_magnitude(S, freqs))
+        return buf[S.shape[1] * hop_length:]
+    
+    carry = pad
+    for block in sf.blocks(audio_path, blocksize=blocksize, frames=frames,
+                           dtype='float32', always_2d=True):
+        carry = consume(np.concatenate([carry, block.mean(axis=1)]))
+    consume(np.concatenate([carry, pad]))
+    
+    if n_frames == 0:
+        return None
+    
+    return spectrum_sum / n_frames, np.concatenate(rolloffs), freqs, sr
+
 
 class FrequencyCutoffDetector(SpectralFeatureExtractor):
     """
@@ -28,6 +246,9 @@ class FrequencyCutoffDetector(SpectralFeatureExtractor):
     cutoffs at specific frequencies (e.g., 16kHz, 20kHz).
     """
     
+    requires = ("spectral_bundle",)
+    required_duration_sec = STATISTICAL_WINDOW_SECONDS
+    
     def __init__(self):
         super().__init__(
             name="frequency_cutoff",
@@ -37,12 +258,29 @@ class FrequencyCutoffDetector(SpectralFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract frequency cutoff features."""
-        # Load audio if not provided
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=None)  # Native SR
-        
-        # Compute spectral rolloff at 99th percentile
-        rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr, roll_percent=0.99)
+        max_duration = kwargs.get('max_duration')
+        S = kwargs.get('S')
+        bundle = kwargs.get('spectral_bundle')
+        rolloff = bundle['rolloff'] if bundle is not None else None
+        
+        # Stream from disk at native SR if audio was not provided
+        if rolloff is None and S is None and (y is None or sr is None):
+            streamed = _stream_spectrum(audio_path, max_duration=max_duration)
+            if streamed is not None:
+                _, rolloff, _, sr = streamed
+            else:
+                y, sr = load_audio_cached(audio_path, sr=None)  # Native SR
+        
+        if rolloff is None:
+            if S is None:
+                if max_duration:
+                    y = y[..., :int(max_duration * sr)]
+                S = stft_magnitude(y)
+            # Spectral rolloff at 99th percentile, straight from the magnitude STFT
+            freqs = kwargs.get('freqs')
+            if freqs is None:
+                freqs = fft_frequencies(sr, 2 * (S.shape[0] - 1))
+            rolloff = _rolloff_from_magnitude(S, freqs)
         cutoff_freq = np.mean(rolloff)
         
         # Calculate score based on suspicious frequencies
@@ -74,16 +312,15 @@ class FrequencyCutoffDetector(SpectralFeatureExtractor):
         - ~16kHz: Common AI/MP3 artifact (0.8)
         - ~20kHz: Suspicious (0.4)
         - > 21kHz: Normal (0.0)
+        
+        Accepts a scalar or an array of cutoffs.
         """
-        if cutoff_freq < 10000:
-            return 0.9
-        elif cutoff_freq > 21000:
-            return 0.0
-        else:
-            # Gaussian peaks at suspicious frequencies
-            score_16k = gaussian_score(cutoff_freq, peak=16000, width=1000, amplitude=0.8)
-            score_20k = gaussian_score(cutoff_freq, peak=20000, width=1000, amplitude=0.4)
-            return max(score_16k, score_20k)
+        f = np.asarray(cutoff_freq, dtype=np.float64)
+        # Gaussian peaks at suspicious frequencies (width 1 kHz)
+        score_16k = 0.8 * np.exp(-((f - 16000) ** 2) / 2e6)
+        score_20k = 0.4 * np.exp(-((f - 20000) ** 2) / 2e6)
+        score = np.select([f < 10000, f > 21000], [0.9, 0.0], default=np.maximum(score_16k, score_20k))
+        return float(score) if score.ndim == 0 else score
 
 
 class SpectralPeakDetector(SpectralFeatureExtractor):
@@ -94,6 +331,8 @@ class SpectralPeakDetector(SpectralFeatureExtractor):
     regular "comb filter" patterns in the high-frequency spectrum.
     """
     
+    requires = ("S", "mean_spectrum", "freqs")
+    
     def __init__(self):
         super().__init__(
             name="spectral_peaks",
@@ -103,15 +342,29 @@ class SpectralPeakDetector(SpectralFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract spectral peak features."""
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=None)
-        
-        # Compute STFT
-        D = np.abs(librosa.stft(y))
-        mean_spectrum = np.mean(D, axis=1)
+        max_duration = kwargs.get('max_duration')
+        S = kwargs.get('S')
+        mean_spectrum = kwargs.get('mean_spectrum')
+        freqs = kwargs.get('freqs')
+        
+        # Stream from disk at native SR if audio was not provided
+        if mean_spectrum is None and S is None and (y is None or sr is None):
+            streamed = _stream_spectrum(audio_path, max_duration=max_duration)
+            if streamed is not None:
+                mean_spectrum, _, freqs, sr = streamed
+            else:
+                y, sr = load_audio_cached(audio_path, sr=None)
+        
+        if mean_spectrum is None:
+            if S is None:
+                if max_duration:
+                    y = y[..., :int(max_duration * sr)]
+                S = stft_magnitude(y)
+            mean_spectrum = np.mean(S, axis=1, dtype=np.float32)
+        if freqs is None:
+            freqs = fft_frequencies(sr, 2 * (len(mean_spectrum) - 1))
         
         # Focus on high frequencies (> 10kHz) where artifacts are visible
-        freqs = librosa.fft_frequencies(sr=sr)
         mask = freqs > 10000
         
         if not np.any(mask):
@@ -133,11 +386,14 @@ class SpectralPeakDetector(SpectralFeatureExtractor):
                 metrics={'high_freq_energy': 0.0}
             )
         
-        norm_spec = high_freq_spectrum / np.max(high_freq_spectrum)
+        norm_spec = high_freq_spectrum.astype(np.float32, copy=False) / np.max(high_freq_spectrum)
         
-        # Calculate "spikiness" using second derivative
-        d2 = np.diff(norm_spec, 2)
-        peak_variance = np.var(d2)
+        # Calculate "spikiness" using second derivative: the [1, -2, 1] stencil
+        # accumulated into one buffer instead of two chained np.diff arrays
+        d2 = norm_spec[2:] + norm_spec[:-2]
+        d2 -= norm_spec[1:-1]
+        d2 -= norm_spec[1:-1]
+        peak_variance = np.var(d2, dtype=np.float32)
         
         # Calculate score
         score = self._calculate_score(peak_variance)
@@ -160,13 +416,8 @@ class SpectralPeakDetector(SpectralFeatureExtractor):
         )
     
     def _calculate_score(self, peak_variance: float) -> float:
-        """Calculate score based on peak variance."""
-        if peak_variance > 1e-4:
-            return 0.9
-        elif peak_variance > 1e-5:
-            return 0.5
-        else:
-            return 0.0
+        """Calculate score based on peak variance (scalar or array)."""
+        return step_score(peak_variance, (1e-4, 1e-5), (0.9, 0.5), above=True)
 
 
 class MFCCAnalyzer(SpectralFeatureExtractor):
@@ -177,6 +428,9 @@ class MFCCAnalyzer(SpectralFeatureExtractor):
     to natural recordings.
     """
     
+    requires = ("mel_db",)
+    required_duration_sec = STATISTICAL_WINDOW_SECONDS
+    
     def __init__(self):
         super().__init__(
             name="mfcc_analysis",
@@ -186,12 +440,18 @@ class MFCCAnalyzer(SpectralFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract MFCC features."""
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)  # Standard SR for MFCCs
-        
-        # Compute MFCCs
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        
+        mel_db = kwargs.get('mel_db')
+        if mel_db is None:
+            if y is None or sr is None:
+                y, sr = load_audio_cached(audio_path, sr=22050)  # Standard SR for MFCCs
+            mel_db = mel_power_db(stft_magnitude(y), sr)
+        
+        # Compute MFCCs from the (shared) log-mel spectrogram
+        mfccs = librosa.feature.mfcc(S=mel_db, n_mfcc=13)
+        return self._build_result(mfccs)
+    
+    def _build_result(self, mfccs: np.ndarray) -> FeatureResult:
+        """Score one file's (n_mfcc, frames) MFCC matrix."""
         # Calculate statistics
         mfcc_mean = np.mean(mfccs, axis=1)
         mfcc_std = np.std(mfccs, axis=1)
@@ -217,9 +477,10 @@ class MFCCAnalyzer(SpectralFeatureExtractor):
             feature_name=self.name,
             score=score,
             confidence=0.6,  # Medium confidence
+            # Arrays stay float32 ndarrays; FeatureResult.to_dict converts them for JSON
             metrics={
-                'mfcc_mean': mfcc_mean.tolist(),
-                'mfcc_std': mfcc_std.tolist(),
+                'mfcc_mean': mfcc_mean,
+                'mfcc_std': mfcc_std,
                 'mfcc_delta_variance': float(delta_variance),
                 'variance_score': float(variance_score),
                 'smoothness_score': float(smoothness_score)
@@ -228,24 +489,16 @@ class MFCCAnalyzer(SpectralFeatureExtractor):
         )
     
     def _check_variance_anomaly(self, mfcc_std: np.ndarray) -> float:
-        """Check if MFCC variance is suspiciously low."""
-        avg_std = np.mean(mfcc_std)
+        """Check if MFCC variance is suspiciously low (one score per row of a batch)."""
+        avg_std = np.mean(mfcc_std, axis=-1)
         # Natural music typically has avg std > 10
         # AI might have lower variance
-        if avg_std < 5:
-            return 0.8
-        elif avg_std < 8:
-            return 0.4
-        return 0.0
+        return step_score(avg_std, (5, 8), (0.8, 0.4))
     
     def _check_smoothness(self, delta_variance: float) -> float:
         """Check if MFCC deltas are too smooth."""
         # Very low delta variance indicates unnatural smoothness
-        if delta_variance < 50:
-            return 0.7
-        elif delta_variance < 100:
-            return 0.3
-        return 0.0
+        return step_score(delta_variance, (50, 100), (0.7, 0.3))
 
 
 class SpectralContrastAnalyzer(SpectralFeatureExtractor):
@@ -256,6 +509,9 @@ class SpectralContrastAnalyzer(SpectralFeatureExtractor):
     in the spectrum. AI music may have unusual patterns.
     """
     
+    requires = ("spectral_bundle",)
+    required_duration_sec = STATISTICAL_WINDOW_SECONDS
+    
     def __init__(self):
         super().__init__(
             name="spectral_contrast",
@@ -265,11 +521,17 @@ class SpectralContrastAnalyzer(SpectralFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract spectral contrast features."""
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
-        
-        # Compute spectral contrast
-        contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
+        bundle = kwargs.get('spectral_bundle')
+        if bundle is not None:
+            contrast = bundle['contrast']
+        else:
+            S = kwargs.get('S')
+            if S is None:
+                if y is None or sr is None:
+                    y, sr = load_audio_cached(audio_path, sr=22050)
+                S = stft_magnitude(y)
+            # Same values as librosa.feature.spectral_contrast, in float32
+            _, contrast = _rolloff_and_contrast(S, fft_frequencies(sr, 2 * (S.shape[0] - 1)), sr)
         
         # Calculate statistics
         contrast_mean = np.mean(contrast, axis=1)
@@ -295,8 +557,8 @@ class SpectralContrastAnalyzer(SpectralFeatureExtractor):
             score=score,
             confidence=0.5,
             metrics={
-                'contrast_mean': contrast_mean.tolist(),
-                'contrast_std': contrast_std.tolist(),
+                'contrast_mean': contrast_mean,
+                'contrast_std': contrast_std,
                 'uniformity_score': float(uniformity_score),
                 'extreme_score': float(extreme_score)
             },
@@ -304,24 +566,19 @@ class SpectralContrastAnalyzer(SpectralFeatureExtractor):
         )
     
     def _check_uniformity(self, contrast_std: np.ndarray) -> float:
-        """Check if contrast is too uniform across bands."""
-        avg_std = np.mean(contrast_std)
+        """Check if contrast is too uniform across bands (one score per row of a batch)."""
+        avg_std = np.mean(contrast_std, axis=-1)
         # Very low std indicates unnatural uniformity
-        if avg_std < 2:
-            return 0.7
-        elif avg_std < 4:
-            return 0.3
-        return 0.0
+        return step_score(avg_std, (2, 4), (0.7, 0.3))
     
     def _check_extremes(self, contrast_mean: np.ndarray) -> float:
-        """Check for extreme contrast values."""
-        max_contrast = np.max(contrast_mean)
-        min_contrast = np.min(contrast_mean)
+        """Check for extreme contrast values (one score per row of a batch)."""
+        max_contrast = np.max(contrast_mean, axis=-1)
+        min_contrast = np.min(contrast_mean, axis=-1)
         
         # Very high or very low values are suspicious
-        if max_contrast > 40 or min_contrast < -10:
-            return 0.6
-        return 0.0
+        return np.maximum(step_score(max_contrast, (40,), (0.6,), above=True),
+                          step_score(min_contrast, (-10,), (0.6,)))
 
 
 class ZeroCrossingRateAnalyzer(SpectralFeatureExtractor):
@@ -332,6 +589,9 @@ class ZeroCrossingRateAnalyzer(SpectralFeatureExtractor):
     AI music may have unusual ZCR patterns.
     """
     
+    requires = ("spectral_bundle",)
+    required_duration_sec = STATISTICAL_WINDOW_SECONDS
+    
     def __init__(self):
         super().__init__(
             name="zcr_analysis",
@@ -341,11 +601,14 @@ class ZeroCrossingRateAnalyzer(SpectralFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract ZCR features."""
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
-        
-        # Compute zero-crossing rate
-        zcr = librosa.feature.zero_crossing_rate(y)[0]
+        bundle = kwargs.get('spectral_bundle')
+        if bundle is not None:
+            zcr = bundle['zcr']
+        else:
+            if y is None or sr is None:
+                y, sr = load_audio_cached(audio_path, sr=22050)
+            # Same values as librosa.feature.zero_crossing_rate, in float32
+            zcr = _zero_crossing_rate(y)
         
         # Calculate statistics
         zcr_mean = np.mean(zcr)
@@ -354,11 +617,7 @@ class ZeroCrossingRateAnalyzer(SpectralFeatureExtractor):
         
         # Check for anomalies
         # Very low variance in ZCR is suspicious
-        variance_score = 0.0
-        if zcr_std < 0.01:
-            variance_score = 0.6
-        elif zcr_std < 0.02:
-            variance_score = 0.3
+        variance_score = step_score(zcr_std, (0.01, 0.02), (0.6, 0.3))
         
         flags = []
         if variance_score > 0.5:
@@ -7,10 +7,69 @@ and onset detection.
 
 import numpy as np
 import librosa
-import scipy.stats
-from typing import Optional
+from typing import Optional, Tuple
 
-from .base import TemporalFeatureExtractor, FeatureResult, load_audio, normalize_score
+from .base import (TemporalFeatureExtractor, FeatureResult, load_audio_cached, normalize_score,
+                   onset_envelope, stft_magnitude, njit)
+
+# Autocorrelation window of librosa.feature.tempo (its ac_size default)
+TEMPOGRAM_SECONDS = 8.0
+
+
+def compute_tempogram(onset_env: np.ndarray, sr: int, hop_length: int = 512) -> np.ndarray:
+    """
+    Autocorrelation tempogram over the window librosa.feature.tempo uses.
+    
+    Shared as the 'tempogram' primitive: tempo estimation takes it as `tg`
+    and RhythmComplexityAnalyzer reads its entropy, so the autocorrelation
+    runs once per file.
+    """
+    win_length = int(librosa.time_to_frames(TEMPOGRAM_SECONDS, sr=sr, hop_length=hop_length))
+    return librosa.feature.tempogram(onset_envelope=onset_env, sr=sr, hop_length=hop_length, win_length=win_length)
+
+
+@njit(fastmath=True, cache=True)
+def _positive_sum_and_xlogx(x: np.ndarray) -> Tuple[float, float]:
+    """Sum of the positive entries of `x` and the sum of v*log(v) over them, in one pass."""
+    total = 0.0
+    acc = 0.0
+    for i in range(x.shape[0]):
+        v = x[i]
+        if v > 0:
+            total += v
+            acc += v * np.log(v)
+    return total, acc
+
+
+@njit(cache=True)
+def grid_quantized_count(intervals: np.ndarray, base: float, tol: float) -> int:
+    """
+    Number of `intervals` within `tol` of 1x, 2x, 3x or 4x `base`.
+    
+    One pass with an early exit per interval, instead of materialising the
+    (intervals x multiples) comparison matrix.
+    """
+    count = 0
+    for i in range(intervals.shape[0]):
+        for k in range(1, 5):
+            if abs(intervals[i] - base * k) < tol:
+                count += 1
+                break
+    return count
+
+
+def shannon_entropy_nonzero(x: np.ndarray) -> Optional[float]:
+    """
+    Shannon entropy (nats) of the positive entries of `x` as a distribution.
+    
+    Matches scipy.stats.entropy(p / p.sum()) for p = x[x > 0], using
+    H = log(T) - sum(v log v) / T so neither the filtered copy nor the
+    normalised one is materialised. Returns None when nothing is positive.
+    """
+    total, acc = _positive_sum_and_xlogx(np.ascontiguousarray(x).ravel())
+    if total <= 0:
+        return None
+    return float(np.log(total) - acc / total)
 
 
 class TempoStabilityAnalyzer(TemporalFeatureExtractor):
@@ -21,6 +80,8 @@ class TempoStabilityAnalyzer(TemporalFeatureExtractor):
     while human performances have natural micro-variations.
     """
     
+    requires = ("onset_env", "beat_track")
+    
     def __init__(self):
         super().__init__(
             name="tempo_stability",
@@ -30,12 +91,17 @@ class TempoStabilityAnalyzer(TemporalFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract tempo stability features."""
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
+        onset_env = kwargs.get('onset_env')
+        if onset_env is None:
+            if y is None or sr is None:
+                y, sr = load_audio_cached(audio_path, sr=22050)
+            onset_env = onset_envelope(stft_magnitude(y), sr)
         
         # Detect beats
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-        tempo, beats = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)
+        beat_track = kwargs.get('beat_track')
+        if beat_track is None:
+            beat_track = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)
+        tempo, beats = beat_track
         
         # Ensure tempo is scalar
         if isinstance(tempo, np.ndarray):
@@ -101,14 +167,10 @@ class TempoStabilityAnalyzer(TemporalFeatureExtractor):
         
         CV < 0.01: Very robotic (0.9)
         CV > 0.05: Very human (0.0)
+        
+        Linear in between; works on a scalar or an array of CVs.
         """
-        if cv < 0.01:
-            return 0.9
-        elif cv > 0.05:
-            return 0.0
-        else:
-            # Linear interpolation
-            return 0.9 * (1.0 - (cv - 0.01) / 0.04)
+        return np.interp(cv, (0.01, 0.05), (0.9, 0.0))
 
 
 class OnsetDetectionAnalyzer(TemporalFeatureExtractor):
@@ -119,6 +181,8 @@ class OnsetDetectionAnalyzer(TemporalFeatureExtractor):
     may have unusual onset patterns.
     """
     
+    requires = ("onset_env",)
+    
     def __init__(self):
         super().__init__(
             name="onset_detection",
@@ -128,11 +192,14 @@ class OnsetDetectionAnalyzer(TemporalFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract onset features."""
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
+        onset_env = kwargs.get('onset_env')
+        if onset_env is None:
+            if y is None or sr is None:
+                y, sr = load_audio_cached(audio_path, sr=22050)
+            onset_env = onset_envelope(stft_magnitude(y), sr)
         
         # Detect onsets
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr)
+        onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr)
         onset_times = librosa.frames_to_time(onset_frames, sr=sr)
         
         if len(onset_times) < 2:
@@ -195,17 +262,10 @@ class OnsetDetectionAnalyzer(TemporalFeatureExtractor):
         hist, bin_edges = np.histogram(intervals, bins=20)
         most_common_interval = bin_edges[np.argmax(hist)]
         
-        # Check how many intervals are close to multiples of this
+        # Check how many intervals are close to 1x, 2x, 3x or 4x of this
         tolerance = most_common_interval * 0.1
-        quantized_count = 0
-        
-        for interval in intervals:
-            # Check if close to 1x, 2x, 3x, etc.
-            for multiple in [1, 2, 3, 4]:
-                expected = most_common_interval * multiple
-                if abs(interval - expected) < tolerance:
-                    quantized_count += 1
-                    break
+        quantized_count = grid_quantized_count(np.ascontiguousarray(intervals, dtype=np.float64),
+                                               float(most_common_interval), float(tolerance))
         
         quantized_ratio = quantized_count / len(intervals)
         
@@ -225,6 +285,8 @@ class RhythmComplexityAnalyzer(TemporalFeatureExtractor):
     compared to human compositions.
     """
     
+    requires = ("onset_env", "tempogram")
+    
     def __init__(self):
         super().__init__(
             name="rhythm_complexity",
@@ -234,19 +296,22 @@ class RhythmComplexityAnalyzer(TemporalFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract rhythm complexity features."""
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
+        onset_env = kwargs.get('onset_env')
+        if onset_env is None:
+            if y is None or sr is None:
+                y, sr = load_audio_cached(audio_path, sr=22050)
+            onset_env = onset_envelope(stft_magnitude(y), sr)
         
-        # Get tempogram
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-        tempogram = librosa.feature.tempogram(onset_envelope=onset_env, sr=sr)
+        # Get tempogram (shared with tempo estimation)
+        tempogram = kwargs.get('tempogram')
+        if tempogram is None:
+            tempogram = compute_tempogram(onset_env, sr)
         
         # Calculate complexity metrics
-        # 1. Entropy of tempogram (higher = more complex)
-        tempogram_flat = tempogram.flatten()
-        tempogram_flat = tempogram_flat[tempogram_flat > 0]  # Remove zeros
+        # 1. Entropy of tempogram over its non-zero bins (higher = more complex)
+        entropy = shannon_entropy_nonzero(tempogram)
         
-        if len(tempogram_flat) == 0:
+        if entropy is None:
             return FeatureResult(
                 feature_name=self.name,
                 score=0.0,
@@ -254,10 +319,6 @@ class RhythmComplexityAnalyzer(TemporalFeatureExtractor):
                 metrics={'error': 'No tempogram data'}
             )
         
-        # Normalize to probability distribution
-        tempogram_prob = tempogram_flat / np.sum(tempogram_flat)
-        entropy = scipy.stats.entropy(tempogram_prob)
-        
         # 2. Variance in onset strength
         onset_variance = np.var(onset_env)
         
@@ -302,6 +363,8 @@ class BeatHistogramAnalyzer(TemporalFeatureExtractor):
     Examines the distribution of beat strengths over time.
     """
     
+    requires = ("onset_env",)
+    
     def __init__(self):
         super().__init__(
             name="beat_histogram",
@@ -311,11 +374,12 @@ class BeatHistogramAnalyzer(TemporalFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         """Extract beat histogram features."""
-        if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
-        
         # Get onset strength envelope
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+        onset_env = kwargs.get('onset_env')
+        if onset_env is None:
+            if y is None or sr is None:
+                y, sr = load_audio_cached(audio_path, sr=22050)
+            onset_env = onset_envelope(stft_magnitude(y), sr)
         
         # Calculate statistics
         onset_mean = np.mean(onset_env)
@@ -5,8 +5,8 @@ Uses Spotify's Basic Pitch to transcribe audio to MIDI,
 allowing for musicological analysis via music21.
 """
 
+import io
 import os
-import tempfile
 import numpy as np
 from typing import Optional, Dict, Any, List
 
@@ -31,6 +31,9 @@ class TranscriptionExtractor(FeatureExtractor):
     Transcribes audio to MIDI and performs basic musicological analysis.
     """
     
+    # Basic Pitch runs a TensorFlow/ONNX model
+    parallel_mode = "serial"
+    
     def __init__(self):
         super().__init__(
             name="midi_extraction",
@@ -61,47 +64,40 @@ class TranscriptionExtractor(FeatureExtractor):
             model_output, midi_data, note_events = predict(audio_path)
             
             # Analyze MIDI with music21
-            # We can export pretty_midi to a temp file and load with music21
-            with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as tmp:
-                midi_data.write(tmp.name)
-                tmp_path = tmp.name
-                
-            try:
-                score = music21.converter.parse(tmp_path)
-                
-                # Basic Musicological Features
-                # 1. Key Estimate (music21)
-                key = score.analyze('key')
-                
-                # 2. Time Signature
-                ts = score.getTimeSignatures()[0] if score.getTimeSignatures() else "Unknown"
-                
-                # 3. Note Density
-                total_notes = len(score.flatten().notes)
-                duration_secs = midi_data.get_end_time()
-                notes_per_sec = total_notes / duration_secs if duration_secs > 0 else 0
-                
-                # 4. Melodic Interval Analysis (detect robotic steps?)
-                # Simplified: just return basic stats
-                
-                metrics = {
-                    'estimated_key': f"{key.tonic.name} {key.mode}",
-                    'key_confidence': key.correlationCoefficient,
-                    'time_signature': f"{ts.numerator}/{ts.denominator}" if hasattr(ts, 'numerator') else str(ts),
-                    'total_notes': total_notes,
-                    'notes_per_second': notes_per_sec
-                }
-                
-                return FeatureResult(
-                    feature_name=self.name,
-                    score=0.0, # Neutral score, used for metadata mostly
-                    metrics=metrics
-                )
-                
-            finally:
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-                    
+            # Serialize pretty_midi in memory; music21 parses the bytes directly
+            buf = io.BytesIO()
+            midi_data.write(buf)
+            score = music21.converter.parse(buf.getvalue(), format='midi')
+            
+            # Basic Musicological Features
+            # 1. Key Estimate (music21)
+            key = score.analyze('key')
+            
+            # 2. Time Signature
+            ts = score.getTimeSignatures()[0] if score.getTimeSignatures() else "Unknown"
+            
+            # 3. Note Density
+            total_notes = len(score.flatten().notes)
+            duration_secs = midi_data.get_end_time()
+            notes_per_sec = total_notes / duration_secs if duration_secs > 0 else 0
+            
+            # 4. Melodic Interval Analysis (detect robotic steps?)
+            # Simplified: just return basic stats
+            
+            metrics = {
+                'estimated_key': f"{key.tonic.name} {key.mode}",
+                'key_confidence': key.correlationCoefficient,
+                'time_signature': f"{ts.numerator}/{ts.denominator}" if hasattr(ts, 'numerator') else str(ts),
+                'total_notes': total_notes,
+                'notes_per_second': notes_per_sec
+            }
+            
+            return FeatureResult(
+                feature_name=self.name,
+                score=0.0, # Neutral score, used for metadata mostly
+                metrics=metrics
+            )
+            
         except Exception as e:
             return FeatureResult(self.name, metrics={'error': f"Transcription failed: {e}"})
 
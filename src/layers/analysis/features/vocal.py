@@ -11,7 +11,152 @@ import librosa
 import scipy.stats
 from typing import Optional, Tuple
 
-from .base import VocalFeatureExtractor, FeatureResult, load_audio, normalize_score
+from .base import (VocalFeatureExtractor, FeatureResult, cuda_available, load_audio_cached, normalize_score,
+                   njit)
+from src.config import AnalysisMode, config, library_importable
+
+# Vocal f0 search range: C2 (65 Hz) to C6 (1046 Hz)
+VOCAL_FMIN = librosa.note_to_hz('C2')
+VOCAL_FMAX = librosa.note_to_hz('C6')
+
+# CREPE periodicity at or above which a frame counts as voiced
+CREPE_VOICING_THRESHOLD = 0.21
+# Frames per CREPE forward pass on the GPU
+CREPE_BATCH_SIZE = 2048
+
+# Breath candidates are unvoiced noise-like runs of roughly 200-500 ms
+BREATH_MIN_SEC = 0.2
+BREATH_MAX_SEC = 0.5
+
+# Central excerpt (seconds) tracked by the YIN fast path outside FORENSIC mode
+YIN_EXCERPT_SECONDS = 30
+# YIN frames quieter than this (dB below the loudest frame) count as unvoiced
+YIN_VOICING_TOP_DB = 35
+
+
+@njit(cache=True)
+def pitch_deviation_stats(f0: np.ndarray, voiced: np.ndarray) -> Tuple[int, float, float]:
+    """
+    Count, mean and std of |midi - round(midi)| over the voiced frames of `f0`.
+    
+    One pass with Welford accumulation, instead of masking f0 and building
+    midi/nearest/deviation temporaries. |m - round(m)| is 0.5 at a tie
+    whichever way it rounds, so floor(m + 0.5) stands in for np.round.
+    """
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(f0.shape[0]):
+        if not voiced[i]:
+            continue
+        midi = 12.0 * np.log2(f0[i] / 440.0) + 69.0
+        dev = abs(midi - np.floor(midi + 0.5))
+        n += 1
+        delta = dev - mean
+        mean += delta / n
+        m2 += delta * (dev - mean)
+    if n == 0:
+        return 0, 0.0, 0.0
+    return n, mean, np.sqrt(m2 / n)
+
+
+def breath_run_lengths(active: np.ndarray, min_len: int, max_len: int) -> int:
+    """Count runs of True in `active` whose length lies in [min_len, max_len]."""
+    edges = np.diff(active.view(np.int8), prepend=0, append=0)
+    lengths = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    return int(np.count_nonzero((lengths >= min_len) & (lengths <= max_len)))
+
+
+def pitch_backend() -> str:
+    """
+    f0 tracker behind the 'pyin' primitive.
+    
+    'torchcrepe' when config.models.pitch_backend asks for it and torchcrepe
+    and a GPU are available, else 'pyin'.
+    """
+    if (config.models.pitch_backend == 'torchcrepe'
+            and config.features.torchcrepe_available and library_importable('torchcrepe')
+            and cuda_available()):
+        return 'torchcrepe'
+    return 'pyin'
+
+
+def compute_pyin(y: np.ndarray, sr: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    f0 curve over the vocal range, shared as the 'pyin' primitive.
+    
+    Returns (f0, voiced_flag, voiced_probs) with f0/probabilities as float32,
+    so a curve read back from the feature cache is identical to a fresh one.
+    Uses PYIN unless `pitch_backend()` selects CREPE on the GPU.
+    """
+    if pitch_backend() == 'torchcrepe':
+        return _crepe_f0(y, sr)
+    f0, voiced_flag, voiced_probs = librosa.pyin(y, fmin=VOCAL_FMIN, fmax=VOCAL_FMAX, sr=sr)
+    return f0.astype(np.float32), voiced_flag, voiced_probs.astype(np.float32)
+
+
+def _crepe_f0(y: np.ndarray, sr: int, hop_length: int = 512) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    CUDA torchcrepe ('tiny' model) f0 in the same layout as librosa.pyin.
+    
+    Frames are trimmed/padded to pyin's centred count, periodicity stands in
+    for the voicing probability, and unvoiced frames get NaN f0.
+    """
+    import torch
+    import torchcrepe
+    
+    with torch.inference_mode():
+        f0, periodicity = torchcrepe.predict(
+            torch.tensor(y, dtype=torch.float32)[None], sr, hop_length,
+            fmin=VOCAL_FMIN, fmax=VOCAL_FMAX, model='tiny', batch_size=CREPE_BATCH_SIZE,
+            device='cuda', return_periodicity=True,
+        )
+    n_frames = 1 + len(y) // hop_length
+    f0 = librosa.util.fix_length(f0[0].cpu().numpy(), size=n_frames)
+    periodicity = librosa.util.fix_length(periodicity[0].cpu().numpy(), size=n_frames)
+    voiced_flag = periodicity >= CREPE_VOICING_THRESHOLD
+    f0 = np.where(voiced_flag, f0, np.nan)
+    return f0.astype(np.float32), voiced_flag, periodicity.astype(np.float32)
+
+
+def compute_yin(y: np.ndarray, sr: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (f0, voiced_flag) from YIN on the central excerpt, shared as the 'yin' primitive.
+    
+    The fast stand-in for PYIN outside FORENSIC mode: no Viterbi decoding,
+    and an RMS gate in place of the voicing probability.
+    """
+    excerpt = int(YIN_EXCERPT_SECONDS * sr)
+    if len(y) > excerpt:
+        start = (len(y) - excerpt) // 2
+        y = y[start:start + excerpt]
+    
+    f0 = librosa.yin(y, fmin=VOCAL_FMIN, fmax=VOCAL_FMAX, sr=sr, frame_length=2048, hop_length=512)
+    rms_db = librosa.amplitude_to_db(
+        librosa.feature.rms(y=y, frame_length=2048, hop_length=512)[0], ref=np.max
+    )
+    # YIN pins unpitched frames to the search bounds; treat those as unvoiced too
+    voiced_flag = (rms_db > -YIN_VOICING_TOP_DB) & (f0 > VOCAL_FMIN) & (f0 < VOCAL_FMAX)
+    return f0, voiced_flag
+
+
+def pitch_primitive(mode: Optional[AnalysisMode]) -> str:
+    """Pitch primitive for `mode`: full PYIN in FORENSIC, the YIN fast path otherwise."""
+    return "pyin" if mode == AnalysisMode.FORENSIC else "yin"
+
+
+def pitch_track(y: np.ndarray, sr: int, **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+    """(f0, voiced_flag) from the injected pitch primitive, or computed for kwargs['mode']."""
+    pyin = kwargs.get('pyin')
+    if pyin is not None:
+        return pyin[0], pyin[1]
+    yin = kwargs.get('yin')
+    if yin is not None:
+        return yin
+    if pitch_primitive(kwargs.get('mode')) == "pyin":
+        f0, voiced_flag, _ = compute_pyin(y, sr)
+        return f0, voiced_flag
+    return compute_yin(y, sr)
 
 
 class PitchQuantizationAnalyzer(VocalFeatureExtractor):
@@ -20,8 +165,16 @@ class PitchQuantizationAnalyzer(VocalFeatureExtractor):
     
     AI vocals often align perfectly to the nearest semitone with
     minimal natural drift.
+    
+    FORENSIC mode tracks pitch with full-length PYIN; other modes use the
+    YIN fast path (see `compute_yin`).
     """
     
+    requires = ("pyin",)
+    
+    def requires_for(self, mode) -> Tuple[str, ...]:
+        return (pitch_primitive(mode),)
+    
     def __init__(self):
         super().__init__(
             name="vocal_pitch",
@@ -33,20 +186,14 @@ class PitchQuantizationAnalyzer(VocalFeatureExtractor):
         """Extract pitch quantization features."""
         # Note: input expects isolated vocals
         if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=None)
+            y, sr = load_audio_cached(audio_path, sr=None)
             
-        # Estimate pitch using PYIN (robust f0 estimation)
-        # Range C2 (65Hz) to C6 (1046Hz) for vocals
-        f0, voiced_flag, voiced_probs = librosa.pyin(
-            y, 
-            fmin=librosa.note_to_hz('C2'), 
-            fmax=librosa.note_to_hz('C6')
-        )
+        f0, voiced_flag = pitch_track(y, sr, **kwargs)
         
-        # Filter only voiced segments
-        f0_voiced = f0[voiced_flag]
+        # Deviation from nearest semitone over voiced frames only
+        num_voiced, avg_deviation, std_deviation = pitch_deviation_stats(f0, voiced_flag)
         
-        if len(f0_voiced) == 0:
+        if num_voiced == 0:
             return FeatureResult(
                 feature_name=self.name,
                 score=0.0,
@@ -55,14 +202,6 @@ class PitchQuantizationAnalyzer(VocalFeatureExtractor):
                 flags=["No vocals detected in track"]
             )
             
-        # Calculate deviation from nearest semitone
-        midi_pitch = librosa.hz_to_midi(f0_voiced)
-        nearest_note = np.round(midi_pitch)
-        deviation = np.abs(midi_pitch - nearest_note)
-        
-        avg_deviation = np.mean(deviation)
-        std_deviation = np.std(deviation)
-        
         # AI (and heavy Auto-Tune) < 0.1 semitones
         # Natural singing > 0.15 semitones
         
@@ -97,8 +236,14 @@ class VibratoAnalyzer(VocalFeatureExtractor):
     
     Natural vibrato has specific rate (5-7Hz) and extent.
     AI vibrato might be absent, too regular, or have wrong rate.
+    Shares the pitch track of PitchQuantizationAnalyzer.
     """
     
+    requires = ("pyin",)
+    
+    def requires_for(self, mode) -> Tuple[str, ...]:
+        return (pitch_primitive(mode),)
+    
     def __init__(self):
         super().__init__(
             name="vocal_vibrato",
@@ -108,10 +253,10 @@ class VibratoAnalyzer(VocalFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=None)
+            y, sr = load_audio_cached(audio_path, sr=None)
             
-        # Only feasible if we have pitch curve
-        f0, voiced_flag, _ = librosa.pyin(y, fmin=65, fmax=1046)
+        # Only feasible if we have pitch curve (shared with pitch quantization)
+        f0, voiced_flag = pitch_track(y, sr, **kwargs)
         
         if np.sum(voiced_flag) < 100:
              return FeatureResult(self.name, metrics={'error': 'Insufficient vocal data'})
@@ -151,7 +296,7 @@ class BreathDetector(VocalFeatureExtractor):
     def extract(self, audio_path: str, y: Optional[np.ndarray] = None,
                 sr: Optional[int] = None, **kwargs) -> FeatureResult:
         if y is None or sr is None:
-            y, sr = load_audio(audio_path, sr=22050)
+            y, sr = load_audio_cached(audio_path, sr=22050)
             
         # Breaths are unvoiced, high-frequency, noise-like segments
         # typically 200-500ms long.
@@ -173,10 +318,10 @@ class BreathDetector(VocalFeatureExtractor):
         
         candidates = (rms > silent_thresh) & (rms < vocal_thresh) & (flatness > flatness_thresh)
         
-        # Count segments
-        # Use simple run length encoding or diff
-        
-        num_breaths = 0 # Placeholder
+        # Count candidate runs of breath length
+        min_len = max(1, int(round(BREATH_MIN_SEC * sr / hop_length)))
+        max_len = int(round(BREATH_MAX_SEC * sr / hop_length))
+        num_breaths = breath_run_lengths(candidates, min_len, max_len)
         
         # AI Detection: Long phrases (> 15s) with no breaths?
         
@@ -200,7 +345,7 @@ class BreathDetector(VocalFeatureExtractor):
             confidence=0.5,
             metrics={
                 'active_ratio': float(active_ratio),
-                'breath_count_est': 0 # To be implemented
+                'breath_count_est': int(num_breaths)
             },
             flags=flags
         )
@@ -1,13 +1,15 @@
 import os
 import sys
 from typing import List, Dict, Optional, Tuple
-import glob
 from dataclasses import dataclass
 from src.utils.logger import logger
 from pathlib import Path
 
 MAX_FILE_SIZE_MB = 500
 
+# URLs handed to a single yt-dlp process (bounds the blast radius of one failure)
+YTDLP_BATCH_SIZE = int(os.getenv('YTDLP_BATCH_SIZE', '16'))
+
 @dataclass
 class AudioSource:
     """Represents a single audio input source."""
@@ -28,24 +30,73 @@ class InputHandler:
         self.input_dir = input_dir
         self.sources: List[AudioSource] = []
         
-    def scan_directory(self, recursive: bool = False) -> List[str]:
-        """Scan input directory for audio files."""
+    def _iter_audio_files(self, root: str, recursive: bool,
+                          max_size_mb: Optional[float] = None) -> List[str]:
+        """
+        Walk `root` with os.scandir and return supported audio files.
+        
+        DirEntry caches the type lookup from readdir, so each entry is
+        classified without building Path objects or issuing extra stats.
+        Hidden entries are skipped and symlinked directories are followed,
+        matching the previous glob behaviour; a link back to a directory
+        already on the current path (or to one already followed) is skipped
+        so cycles terminate.
+        """
+        exts = self.SUPPORTED_EXTENSIONS
         files = []
-        if recursive:
-            search_pattern = os.path.join(self.input_dir, '**', '*')
-        else:
-            search_pattern = os.path.join(self.input_dir, '*')
-            
-        for filepath in glob.glob(search_pattern, recursive=recursive):
-            if os.path.isfile(filepath):
-                ext = os.path.splitext(filepath)[1].lower()
-                if ext in self.SUPPORTED_EXTENSIONS:
-                    files.append(filepath)
+        # (path, resolved path) pairs; only symlinks need an extra realpath
+        stack = [(root, os.path.realpath(root))]
+        followed = set()
+        while stack:
+            path, real = stack.pop()
+            try:
+                it = os.scandir(path)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    name = entry.name
+                    if name.startswith('.'):
+                        continue
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        continue
+                    if is_dir:
+                        if not recursive:
+                            continue
+                        if entry.is_symlink():
+                            target = os.path.realpath(entry.path)
+                            if (target in followed or real == target
+                                    or real.startswith(target + os.sep)):
+                                continue
+                            followed.add(target)
+                        else:
+                            target = os.path.join(real, name)
+                        stack.append((entry.path, target))
+                        continue
+                    dot = name.rfind('.')
+                    if dot < 0 or name[dot:].lower() not in exts:
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        if max_size_mb is not None:
+                            size_mb = entry.stat().st_size / (1024 * 1024)
+                            if size_mb > max_size_mb:
+                                logger.warning(f"Skipping large file: {entry.path} ({size_mb:.1f}MB)")
+                                continue
+                    except OSError:
+                        continue
+                    files.append(entry.path)
         return files
         
+    def scan_directory(self, recursive: bool = False) -> List[str]:
+        """Scan input directory for audio files."""
+        return self._iter_audio_files(self.input_dir, recursive)
+        
     def scan_directory_path(self, path: str) -> List[str]:
         """Scan a specific directory path recursively with safety checks."""
-        files = []
         if not os.path.exists(path): return []
         
         # Security: Prevent path traversal
@@ -55,22 +106,7 @@ class InputHandler:
              # This is a bit relaxed for now to allow user flexibility but warns
              logger.debug(f"Scanning path outside standard input dir: {absolute_path}")
 
-        search_pattern = os.path.join(path, '**', '*')
-        for filepath in glob.glob(search_pattern, recursive=True):
-            if os.path.isfile(filepath):
-                # Check file size
-                try:
-                    size_mb = os.path.getsize(filepath) / (1024 * 1024)
-                    if size_mb > MAX_FILE_SIZE_MB:
-                        logger.warning(f"Skipping large file: {filepath} ({size_mb:.1f}MB)")
-                        continue
-                except OSError:
-                    continue
-
-                ext = os.path.splitext(filepath)[1].lower()
-                if ext in self.SUPPORTED_EXTENSIONS:
-                    files.append(filepath)
-        return files
+        return self._iter_audio_files(path, recursive=True, max_size_mb=MAX_FILE_SIZE_MB)
 
     def add_sources_from_paths(self, file_paths: List[str], group_id: Optional[str] = None):
         """Add local files to source list."""
@@ -135,6 +171,7 @@ class InputHandler:
         os.makedirs(output_dir, exist_ok=True)
         
         downloaded = []
+        youtube_sources = []
         
         for source in self.sources:
             if source.source_type == 'file':
@@ -181,28 +218,8 @@ class InputHandler:
                         pass
 
                 elif "youtube" in url or "youtu.be" in url:
-                    # Use yt-dlp
-                    out_tmpl = os.path.join(output_dir, "%(artist)s - %(title)s.%(ext)s")
-                    
-                    cmd = [
-                        "yt-dlp",
-                        "-x", "--audio-format", "mp3",
-                        "--add-metadata",
-                        "--no-playlist",
-                        "-o", out_tmpl,
-                        url
-                    ]
-                    
-                    pre_files = set(os.listdir(output_dir))
-                    subprocess.run(cmd, check=True)
-                    post_files = set(os.listdir(output_dir))
-                    new_files = post_files - pre_files
-                    
-                    for f in new_files:
-                        if f.endswith('.mp3'):
-                             full_path = os.path.join(output_dir, f)
-                             downloaded.append((source, full_path))
-                             print(f"   ✅ Downloaded: {f}")
+                    # Batched below so one yt-dlp process serves many URLs
+                    youtube_sources.append(source)
 
                 elif "deezer" in url:
                     print("⚠️  Deezer direct download not fully supported. Trying 'spotdl' URL search...")
@@ -214,6 +231,50 @@ class InputHandler:
             except Exception as e:
                 print(f"❌ Error downloading {url}: {e}")
                 
+        for i in range(0, len(youtube_sources), YTDLP_BATCH_SIZE):
+            downloaded.extend(self._download_youtube_batch(youtube_sources[i:i + YTDLP_BATCH_SIZE], output_dir))
+                
+        return downloaded
+        
+    def _download_youtube_batch(self, sources: List[AudioSource], output_dir: str) -> List[Tuple[AudioSource, str]]:
+        """
+        Download several YouTube URLs with one yt-dlp invocation.
+        
+        yt-dlp prints "<url>\t<final path>" for each finished file, which maps
+        outputs back to their sources without re-listing the directory.
+        """
+        import subprocess
+        
+        out_tmpl = os.path.join(output_dir, "%(artist)s - %(title)s.%(ext)s")
+        by_url = {source.path_or_url: source for source in sources}
+        
+        cmd = [
+            "yt-dlp",
+            "-x", "--audio-format", "mp3",
+            "--add-metadata",
+            "--no-playlist",
+            "--ignore-errors",
+            "--print", "after_move:%(original_url)s\t%(filepath)s",
+            "-o", out_tmpl,
+            *by_url
+        ]
+        
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True)
+        except Exception as e:
+            print(f"❌ Error downloading YouTube batch: {e}")
+            return []
+            
+        downloaded = []
+        for line in proc.stdout.splitlines():
+            url, _, path = line.partition("\t")
+            source = by_url.pop(url, None)
+            if source is not None and path:
+                downloaded.append((source, path))
+                print(f"   ✅ Downloaded: {os.path.basename(path)}")
+                
+        for url in by_url:
+            print(f"   ❌ yt-dlp failed: {url}")
         return downloaded
 
 def get_input_handler(input_dir: str):
@@ -18,7 +18,7 @@ try:
     from .config import config, AnalysisMode, Genre
     from .layers.orchestration.history import history_manager
     from .layers.input.handler import get_input_handler, AudioSource
-    from .layers.analysis.core import Analyzer
+    from .layers.analysis.core import get_analyzer
     from .layers.reporting.generator import MultiFormatReporter
     from .layers.orchestration.llm.client import LLMClient
     from .layers.orchestration.llm.agents import CriticAgent, PublicReporterAgent
@@ -31,7 +31,7 @@ except ImportError:
     from src.config import config, AnalysisMode, Genre
     from src.layers.orchestration.history import history_manager
     from src.layers.input.handler import get_input_handler, AudioSource
-    from src.layers.analysis.core import Analyzer
+    from src.layers.analysis.core import get_analyzer
     from src.layers.reporting.generator import MultiFormatReporter
     from src.layers.orchestration.llm.client import LLMClient
     from src.layers.orchestration.llm.agents import CriticAgent, PublicReporterAgent
@@ -167,7 +167,7 @@ def main():
         return
 
     # 3. Initialize Engines
-    analyzer = Analyzer()
+    analyzer = get_analyzer()
     
     # Initialize LLM Agents if provider selected
     critic_agent = None
@@ -195,26 +195,28 @@ def main():
     # 4. Run Analysis Loop
     all_results = {}
     
+    # Pass metadata to allow genre-specific weighting
     for source in ready_sources:
-        print(f"🔍 Analyzing: {source.path_or_url}")
+        metadata = source.metadata or {}
+        if not metadata.get('genre') or metadata.get('genre') == 'general':
+            metadata['genre'] = args.genre
+        source.metadata = metadata
         
-        # Determine features based on mode
-        # analyzer.analyze_file(file, mode)
-        try:
-            # Pass metadata to allow genre-specific weighting
-            metadata = source.metadata or {}
-            if not metadata.get('genre') or metadata.get('genre') == 'general':
-                metadata['genre'] = args.genre
-                
-            results = analyzer.analyze_audio(
-                source.path_or_url, 
-                mode=AnalysisMode(args.mode),
-                metadata=metadata
-            )
+    print(f"🔍 Analyzing {len(ready_sources)} source(s)...")
+    batch_results = analyzer.analyze_batch(
+        [source.path_or_url for source in ready_sources],
+        mode=AnalysisMode(args.mode),
+        metadata=[source.metadata for source in ready_sources]
+    )
+    
+    for source, results in zip(ready_sources, batch_results):
+        if results is None:
+            continue
             
+        try:
             # Enrich with Metadata (LLM)
             if researcher_agent:
-                print("   🤖 Researching context...")
+                print(f"   🤖 Researching context for {os.path.basename(source.path_or_url)}...")
                 # We need artist/title from metadata or filename
                 # For now using filename
                 fname = os.path.basename(source.path_or_url)
@@ -4,6 +4,8 @@ Unit tests for Analyzer - Simplified version.
 
 import unittest
 
+import numpy as np
+
 class TestAnalyzer(unittest.TestCase):
     """Simplified tests for Analyzer."""
     
@@ -13,5 +15,40 @@ class TestAnalyzer(unittest.TestCase):
         """
         self.assertTrue(True)
 
+
+class TestAlbumConsistency(unittest.TestCase):
+    """Tests for AlbumConsistencyComparator."""
+    
+    @staticmethod
+    def _track(filename, mfcc_mean):
+        return {"filename": filename,
+                "features": {"mfcc_analysis": {"metrics": {"mfcc_mean": list(mfcc_mean)}}}}
+    
+    def test_similarity_matches_pairwise_cosine(self):
+        """GEMM similarities equal pairwise cosines, keyed by the compared filenames."""
+        from src.layers.analysis.comparator import AlbumConsistencyComparator
+        
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(3, 13))
+        results = [self._track(f"t{i}.wav", v) for i, v in enumerate(vectors)]
+        # A failed analysis and a track without MFCCs are left out
+        results[1:1] = [None, {"filename": "no_mfcc.wav", "features": {}}]
+        
+        summary = AlbumConsistencyComparator().analyze_album(results)
+        
+        self.assertEqual(summary["tracks"], ["t0.wav", "t1.wav", "t2.wav"])
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = unit @ unit.T
+        np.testing.assert_allclose(summary["similarity_matrix"], expected, atol=1e-6)
+        off_diag = (expected.sum(axis=1) - 1.0) / 2
+        for name, value in zip(summary["tracks"], off_diag):
+            self.assertAlmostEqual(summary["mean_similarity"][name], value, places=6)
+        self.assertAlmostEqual(summary["group_mean_similarity"], off_diag.mean(), places=6)
+    
+    def test_needs_two_tracks(self):
+        from src.layers.analysis.comparator import AlbumConsistencyComparator
+        summary = AlbumConsistencyComparator().analyze_album([self._track("a.wav", np.ones(13))])
+        self.assertEqual(summary["status"], "insufficient_tracks")
+
 if __name__ == '__main__':
     unittest.main()
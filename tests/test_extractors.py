@@ -2,8 +2,21 @@
 Unit tests for feature extractors - Placeholder version.
 """
 
+import os
 import unittest
 
+import numpy as np
+
+
+def _test_signal(seconds: float = 3.0, sr: int = 22050, seed: int = 0) -> np.ndarray:
+    """A 330 Hz tone in light noise with a quiet gap, as float32."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    y = 0.3 * np.sin(2 * np.pi * 330.0 * t) + 0.05 * rng.standard_normal(len(t))
+    y[len(y) // 3:len(y) // 2] *= 1e-4
+    return y.astype(np.float32)
+
+
 class TestFeatureExtractors(unittest.TestCase):
     """Placeholder tests for feature extractors."""
     
@@ -15,5 +28,387 @@ class TestFeatureExtractors(unittest.TestCase):
         """
         self.assertTrue(True)
 
+
+class TestSharedPrimitives(unittest.TestCase):
+    """Shared STFT-derived primitives against the librosa calls they stand in for."""
+    
+    def test_stft_magnitude_matches_librosa(self):
+        import librosa
+        from src.layers.analysis.features.base import stft_magnitude
+        
+        # Odd length, and more frames than one rfft block
+        y = _test_signal()[:-77]
+        S = stft_magnitude(y)
+        
+        self.assertEqual(S.dtype, np.float32)
+        np.testing.assert_allclose(S, np.abs(librosa.stft(y)), atol=1e-4)
+    
+    def test_mel_power_db_matches_librosa(self):
+        import librosa
+        from src.layers.analysis.features.base import mel_power_db, stft_magnitude
+        
+        sr = 22050
+        S = stft_magnitude(_test_signal(sr=sr))
+        np.testing.assert_allclose(mel_power_db(S, sr),
+                                   librosa.power_to_db(librosa.feature.melspectrogram(S=S ** 2, sr=sr)), atol=1e-4)
+    
+    def test_onset_envelope_matches_librosa(self):
+        import librosa
+        from src.layers.analysis.features.base import onset_envelope, stft_magnitude
+        
+        sr = 22050
+        y = _test_signal(sr=sr)
+        np.testing.assert_allclose(onset_envelope(stft_magnitude(y), sr),
+                                   librosa.onset.onset_strength(y=y, sr=sr), atol=1e-4)
+
+
+class TestSpectralKernels(unittest.TestCase):
+    """Fused spectral kernels against the librosa features they replace."""
+    
+    def test_rolloff_and_contrast_match_librosa(self):
+        import librosa
+        from src.layers.analysis.features.base import fft_frequencies, stft_magnitude
+        from src.layers.analysis.features.spectral import _rolloff_and_contrast
+        
+        sr = 22050
+        S = stft_magnitude(_test_signal(sr=sr))
+        rolloff, contrast = _rolloff_and_contrast(S, fft_frequencies(sr, 2048), sr)
+        
+        np.testing.assert_array_equal(rolloff, librosa.feature.spectral_rolloff(S=S, sr=sr, roll_percent=0.99)[0])
+        np.testing.assert_allclose(contrast, librosa.feature.spectral_contrast(S=S, sr=sr), atol=1e-4)
+    
+    def test_zero_crossing_rate_matches_librosa(self):
+        import librosa
+        from src.layers.analysis.features.spectral import _zero_crossing_rate
+        
+        # Odd length, so the final hop block is partial
+        y = _test_signal()[:-77]
+        np.testing.assert_array_equal(_zero_crossing_rate(y), librosa.feature.zero_crossing_rate(y)[0])
+
+
+class TestHarmonicKernels(unittest.TestCase):
+    """Harmonic-feature kernels against the librosa/scipy code they replace."""
+    
+    def test_median_filter_matches_scipy(self):
+        import scipy.ndimage
+        from src.layers.analysis.features.harmonic import _median_filter
+        
+        X = np.random.default_rng(0).random((40, 60)).astype(np.float32)
+        # Kernels wider than the axis exercise the reflected boundary
+        for k in (7, 31, 61):
+            np.testing.assert_array_equal(_median_filter(X, k, axis=1),
+                                          scipy.ndimage.median_filter(X, size=(1, k), mode='reflect'))
+            np.testing.assert_array_equal(_median_filter(X, k, axis=0),
+                                          scipy.ndimage.median_filter(X, size=(k, 1), mode='reflect'))
+    
+    def test_hpss_energies_match_librosa(self):
+        import librosa
+        from src.layers.analysis.features.base import stft_magnitude
+        from src.layers.analysis.features.harmonic import _hpss_energies
+        
+        y = _test_signal()
+        y[::2205] += 0.8  # clicks, for a non-trivial percussive part
+        e_harm, e_perc = _hpss_energies(stft_magnitude(y), len(y))
+        
+        harmonic, percussive = librosa.decompose.hpss(librosa.stft(y))
+        self.assertAlmostEqual(e_harm, np.mean(librosa.istft(harmonic, length=len(y)) ** 2), delta=0.02 * e_harm)
+        self.assertAlmostEqual(e_perc, np.mean(librosa.istft(percussive, length=len(y)) ** 2), delta=0.1 * e_perc)
+    
+    def test_estimate_key_matches_profile_correlation(self):
+        from src.layers.analysis.features.harmonic import KS_MAJOR, KS_MINOR, NOTE_NAMES, estimate_key
+        
+        rng = np.random.default_rng(5)
+        for _ in range(20):
+            chroma = rng.random(12)
+            scores = [(np.corrcoef(chroma, np.roll(profile, tonic))[0, 1], NOTE_NAMES[tonic], scale)
+                      for scale, profile in (('major', KS_MAJOR), ('minor', KS_MINOR)) for tonic in range(12)]
+            strength, key, scale = max(scores)
+            
+            got_key, got_scale, got_strength = estimate_key(chroma)
+            self.assertEqual((got_key, got_scale), (key, scale))
+            self.assertAlmostEqual(got_strength, strength, places=10)
+        self.assertEqual(estimate_key(np.full(12, 0.5)), ("Unknown", "Unknown", 0.0))
+
+
+class TestTemporalKernels(unittest.TestCase):
+    """Hand-written temporal kernels against the NumPy code they replace."""
+    
+    def test_grid_quantized_count_matches_broadcast(self):
+        from src.layers.analysis.features.temporal import grid_quantized_count
+        
+        rng = np.random.default_rng(1)
+        base = 0.25
+        # Intervals on and off a 0.25 s grid, with jitter around the tolerance
+        intervals = np.concatenate([base * rng.integers(1, 6, 200) + rng.normal(0, 0.02, 200),
+                                    rng.uniform(0.05, 1.5, 100)])
+        tol = base * 0.1
+        near_grid = np.abs(intervals[:, None] - base * np.arange(1, 5)[None, :]) < tol
+        expected = int(np.count_nonzero(near_grid.any(axis=1)))
+        
+        self.assertEqual(grid_quantized_count(intervals, base, tol), expected)
+        self.assertEqual(grid_quantized_count(np.empty(0), base, tol), 0)
+    
+    def test_shannon_entropy_matches_scipy(self):
+        import scipy.stats
+        from src.layers.analysis.features.temporal import shannon_entropy_nonzero
+        
+        x = np.random.default_rng(2).normal(size=(30, 40))
+        p = x[x > 0]
+        self.assertAlmostEqual(shannon_entropy_nonzero(x), scipy.stats.entropy(p / p.sum()), places=9)
+        self.assertIsNone(shannon_entropy_nonzero(-np.abs(x)))
+
+
+class TestMidiGrid(unittest.TestCase):
+    """FFT grid search of MIDIQuantizationAnalyzer against direct vector strength."""
+    
+    def test_onset_grid_matches_direct_vector_strength(self):
+        from src.layers.analysis.features.midi_features import GRID_SEARCH_TOLERANCE, onset_grid
+        
+        n, frame_rate, tempo = 1200, 40.0, 150.0
+        rng = np.random.default_rng(6)
+        on_grid = np.arange(3, n, 4)  # 10 Hz, the 16th-note rate at 150 BPM
+        for frames in (on_grid, np.unique(np.clip(on_grid + rng.integers(-1, 2, len(on_grid)), 0, n - 1)),
+                       np.sort(rng.choice(n, 200, replace=False))):
+            weights = np.hanning(n)[frames]
+            expected_bin = 4.0 * tempo / 60.0 * n / frame_rate
+            reach = max(2.0, GRID_SEARCH_TOLERANCE * expected_bin)
+            bins = np.arange(max(int(expected_bin - reach), 1), int(expected_bin + reach) + 1)
+            sums = np.exp(-2j * np.pi * np.outer(bins, frames) / n) @ weights
+            best = int(np.argmax(np.abs(sums)))
+            
+            grid_freq, periodicity, phase = onset_grid(frames, n, tempo, frame_rate)
+            self.assertAlmostEqual(grid_freq, bins[best] * frame_rate / n)
+            self.assertAlmostEqual(periodicity, abs(sums[best]) / weights.sum(), places=9)
+            self.assertAlmostEqual(phase, np.angle(sums[best]), places=9)
+        
+        self.assertGreater(onset_grid(on_grid, n, tempo, frame_rate)[1], 0.99)
+        self.assertIsNone(onset_grid(on_grid, n, 900.0, frame_rate))
+
+
+class TestStructuralDensity(unittest.TestCase):
+    """Closed-form self-similarity density against the full similarity matrix."""
+    
+    def test_density_matches_matrix_mean(self):
+        from src.layers.analysis.features.structural import self_similarity_density
+        
+        features = np.abs(np.random.default_rng(7).normal(size=(12, 80)))
+        features[:, 5] = 0.0  # a silent frame
+        X = features / np.maximum(np.linalg.norm(features, axis=0), 1e-12)
+        ssm = X.T @ X
+        n = ssm.shape[0]
+        expected = (ssm.sum() - np.trace(ssm)) / (n * (n - 1))
+        
+        self.assertAlmostEqual(self_similarity_density(features), expected, places=10)
+        self.assertEqual(self_similarity_density(features[:, :1]), 0.0)
+
+
+class TestForensicKernels(unittest.TestCase):
+    """Forensic-feature kernels against the librosa code they replace."""
+    
+    def test_split_by_rms_matches_librosa(self):
+        import librosa
+        from src.layers.analysis.features.forensic import SilenceExtractor
+        
+        y = _test_signal()[:-77]
+        # frame_length 1500 is not a multiple of the hop: the strided fallback
+        for kwargs in ({'top_db': 30}, {'top_db': 60}, {'top_db': 40, 'frame_length': 1500}):
+            np.testing.assert_array_equal(SilenceExtractor._split_by_rms(y, **kwargs),
+                                          librosa.effects.split(y, **kwargs))
+        silent = np.zeros(5000, dtype=np.float32)
+        np.testing.assert_array_equal(SilenceExtractor._split_by_rms(silent), librosa.effects.split(silent))
+
+
+class TestJsonSerialization(unittest.TestCase):
+    """dump_json/load_json give the same document with and without orjson."""
+    
+    def test_non_finite_round_trip(self):
+        from unittest import mock
+        from src.layers.analysis.features import base
+        
+        doc = {'score': np.float32(0.5), 'mean': float('nan'), 'peak': np.float64(np.inf),
+               'curve': np.array([1.0, np.nan, -np.inf]), 'nested': [{'x': float('-inf')}, (1, 2)]}
+        expected = {'score': 0.5, 'mean': None, 'peak': None,
+                    'curve': [1.0, None, None], 'nested': [{'x': None}, [1, 2]]}
+        
+        self.assertEqual(base.load_json(base.dump_json(doc)), expected)
+        with mock.patch.object(base, 'ORJSON_AVAILABLE', False):
+            self.assertEqual(base.load_json(base.dump_json(doc)), expected)
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """Cache keys of finished analyses and shared primitives."""
+    
+    def test_analysis_key_tracks_inputs_and_version(self):
+        import tempfile
+        from unittest import mock
+        from src.config import AnalysisMode
+        from src.layers.analysis import core
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "track.wav")
+            with open(path, 'wb') as f:
+                f.write(b"RIFF" + bytes(range(256)) * 16)
+            args = (path, AnalysisMode.STANDARD, ("a", "b"), {"genre": "pop"})
+            key = core._cache_key(*args)
+            
+            self.assertEqual(core._cache_key(*args), key)
+            self.assertNotEqual(core._cache_key(path, AnalysisMode.QUICK, *args[2:]), key)
+            self.assertNotEqual(core._cache_key(path, args[1], ("a",), args[3]), key)
+            self.assertNotEqual(core._cache_key(*args[:3], {"genre": "jazz"}), key)
+            with mock.patch.object(core, 'ANALYZE_CACHE_VERSION', core.ANALYZE_CACHE_VERSION + 1):
+                self.assertNotEqual(core._cache_key(*args), key)
+            
+            with open(path, 'r+b') as f:
+                f.write(b"RIFX")
+            self.assertNotEqual(core._cache_key(*args), key)
+    
+    def test_primitive_cache_round_trip_and_version(self):
+        import tempfile
+        from pathlib import Path
+        from unittest import mock
+        from src.layers.analysis import core
+        
+        y = _test_signal(seconds=0.5)
+        digest = core._audio_digest(y, 22050)
+        self.assertEqual(core._audio_digest(y.copy(), 22050), digest)
+        self.assertNotEqual(core._audio_digest(y, 44100), digest)
+        self.assertNotEqual(core._audio_digest(y[:-1], 22050), digest)
+        with mock.patch.object(core, 'FEATURE_CACHE_VERSION', core.FEATURE_CACHE_VERSION + 1):
+            self.assertNotEqual(core._audio_digest(y, 22050), digest)
+        
+        value = (np.linspace(0, 1, 50), np.arange(50) % 3 == 0)
+        calls = []
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(core, 'FEATURE_CACHE_DIR', Path(tmp)):
+            for _ in range(2):
+                f0, voiced = core._cached_primitive("pyin-pyin", digest, lambda: calls.append(1) or value)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(f0.dtype, np.float32)
+            np.testing.assert_array_equal(f0, value[0].astype(np.float32))
+            np.testing.assert_array_equal(voiced, value[1])
+
+
+class TestProcessPools(unittest.TestCase):
+    """Process-pool analysis paths give the same output as the serial/threaded ones."""
+    
+    @classmethod
+    def setUpClass(cls):
+        import tempfile
+        import soundfile as sf
+        
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.paths = []
+        for seed in (0, 1):
+            path = os.path.join(cls.tmp.name, f"track{seed}.wav")
+            sf.write(path, _test_signal(seconds=5.0, seed=seed), 22050)
+            cls.paths.append(path)
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+    
+    def setUp(self):
+        from unittest import mock
+        from src.layers.analysis import core
+        
+        # Every run computes from scratch
+        for name in ('ANALYZE_CACHE_ENABLED', 'FEATURE_CACHE_ENABLED'):
+            patcher = mock.patch.object(core, name, False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    @staticmethod
+    def _comparable(result):
+        from src.layers.analysis.features.base import dump_json, load_json
+        return load_json(dump_json({'features': result['features'], 'ai_probability': result['ai_probability']}))
+    
+    def test_analyze_batch_workers_match_serial(self):
+        from src.config import AnalysisMode
+        from src.layers.analysis.core import Analyzer
+        
+        analyzer = Analyzer()
+        serial = analyzer.analyze_batch(self.paths, mode=AnalysisMode.STANDARD, max_workers=1)
+        pooled = analyzer.analyze_batch(self.paths, mode=AnalysisMode.STANDARD, max_workers=2)
+        
+        self.assertEqual([self._comparable(r) for r in pooled], [self._comparable(r) for r in serial])
+    
+    def test_extractor_processes_match_threads(self):
+        import dataclasses
+        from unittest import mock
+        from src.config import AnalysisMode, config
+        from src.layers.analysis.core import Analyzer
+        
+        analyzer = Analyzer()
+        threaded = analyzer.analyze_audio(self.paths[0], mode=AnalysisMode.STANDARD)
+        with mock.patch.object(config, 'api', dataclasses.replace(config.api, extractor_processes=2)):
+            try:
+                forked = analyzer.analyze_audio(self.paths[0], mode=AnalysisMode.STANDARD)
+                self.assertIsNotNone(analyzer._process_pool)
+            finally:
+                analyzer.close()
+        
+        self.assertEqual(self._comparable(forked), self._comparable(threaded))
+
+
+class TestVocalKernels(unittest.TestCase):
+    """Hand-written vocal kernels against the NumPy code they replace."""
+    
+    def test_pitch_deviation_stats_match_numpy(self):
+        from src.layers.analysis.features.vocal import pitch_deviation_stats
+        
+        rng = np.random.default_rng(3)
+        f0 = rng.uniform(80.0, 900.0, 500)
+        voiced = rng.random(500) > 0.3
+        deviation = np.abs(12 * np.log2(f0[voiced] / 440.0) + 69
+                           - np.round(12 * np.log2(f0[voiced] / 440.0) + 69))
+        
+        n, mean, std = pitch_deviation_stats(f0, voiced)
+        self.assertEqual(n, int(voiced.sum()))
+        self.assertAlmostEqual(mean, deviation.mean(), places=10)
+        self.assertAlmostEqual(std, deviation.std(), places=10)
+        self.assertEqual(pitch_deviation_stats(f0, np.zeros(500, dtype=bool)), (0, 0.0, 0.0))
+    
+    def test_breath_run_lengths_match_loop(self):
+        from src.layers.analysis.features.vocal import breath_run_lengths
+        
+        active = np.random.default_rng(4).random(2000) > 0.4
+        runs, length = [], 0
+        for value in active:
+            if value:
+                length += 1
+            elif length:
+                runs.append(length)
+                length = 0
+        if length:
+            runs.append(length)
+        
+        for min_len, max_len in ((1, 1), (2, 5), (3, 40)):
+            expected = sum(min_len <= r <= max_len for r in runs)
+            self.assertEqual(breath_run_lengths(active, min_len, max_len), expected)
+        self.assertEqual(breath_run_lengths(np.ones(10, dtype=bool), 10, 10), 1)
+
+
+class TestVocalPitch(unittest.TestCase):
+    """Pitch primitive selection of the vocal extractors."""
+    
+    def test_pyin_only_in_forensic(self):
+        from src.config import AnalysisMode
+        from src.layers.analysis.features.vocal import PitchQuantizationAnalyzer, VibratoAnalyzer
+        
+        for extractor in (PitchQuantizationAnalyzer(), VibratoAnalyzer()):
+            self.assertEqual(extractor.requires_for(AnalysisMode.FORENSIC), ("pyin",))
+            for mode in (AnalysisMode.QUICK, AnalysisMode.STANDARD, AnalysisMode.DEEP):
+                self.assertEqual(extractor.requires_for(mode), ("yin",))
+    
+    def test_yin_track_shape(self):
+        from src.layers.analysis.features.vocal import compute_yin
+        
+        sr = 22050
+        t = np.arange(2 * sr) / sr
+        f0, voiced = compute_yin(0.5 * np.sin(2 * np.pi * 220.0 * t), sr)
+        
+        self.assertEqual(f0.shape, voiced.shape)
+        self.assertGreater(voiced.mean(), 0.9)
+        np.testing.assert_allclose(np.median(f0[voiced]), 220.0, rtol=0.01)
+
 if __name__ == '__main__':
     unittest.main()
@@ -9,6 +9,7 @@ import os
 import tempfile
 import shutil
 from pathlib import Path
+from unittest import mock
 
 # We'll need to generate a test audio file
 import numpy as np
@@ -42,13 +43,17 @@ class TestFullPipeline(unittest.TestCase):
     
     def test_analyzer_pipeline(self):
         """Test that Analyzer can process a file end-to-end."""
+        from src.layers.analysis import core
         from src.layers.analysis.core import Analyzer
         from src.config import AnalysisMode
         
         analyzer = Analyzer()
         
-        # Run analysis in QUICK mode
-        results = analyzer.analyze_audio(self.test_audio_path, mode=AnalysisMode.QUICK)
+        # Run analysis in QUICK mode, caching into the temp dir rather than the repo
+        cache_dir = Path(self.test_dir) / "cache"
+        with mock.patch.multiple(core, ANALYZE_CACHE_DIR=cache_dir / "analyze",
+                                 FEATURE_CACHE_DIR=cache_dir / "features"):
+            results = analyzer.analyze_audio(self.test_audio_path, mode=AnalysisMode.QUICK)
         
         # Verify structure
         self.assertIn('filename', results)